@@ -1,6 +1,167 @@
-import math
+import numpy as np
 
-from numpy import linalg as la
+# Bits used to encode the strategies a track is findable with and the 
+# FindableTrackResult members they are read from
+FINDABLE_4S   = 1 << 0
+FINDABLE_3S1A = 1 << 1
+FINDABLE_2S2A = 1 << 2
+FINDABLE_2S   = 1 << 3
+FINDABLE_2A   = 1 << 4
+FINDABLE_STRATEGIES = [
+    (FINDABLE_4S,   'is4sFindable_'),
+    (FINDABLE_3S1A, 'is3s1aFindable_'),
+    (FINDABLE_2S2A, 'is2s2aFindable_'),
+    (FINDABLE_2S,   'is2sFindable_'),
+    (FINDABLE_2A,   'is2aFindable_')
+]
+
+# Track definitions given as the strategies a track needs to be findable 
+# with (any of), the strategies it can't be findable with and whether the
+# recoil electron (see get_first_recoil_index) is excluded.
+FINDABLE_DEFINITIONS = { 
+    'track' : (FINDABLE_4S | FINDABLE_3S1A | FINDABLE_2S2A, 0, False), 
+    'loose' : (FINDABLE_2S, 0, False), 
+    'axial' : (FINDABLE_2A, 0, False)
+}
+
+# Definitions used by the photonuclear studies.  Stubs and axial tracks are 
+# exclusive of the tighter categories. 
+PN_FINDABLE_DEFINITIONS = { 
+    'track' : (FINDABLE_4S | FINDABLE_3S1A, 0, False), 
+    'stub'  : (FINDABLE_2S, FINDABLE_4S | FINDABLE_3S1A, True), 
+    'axial' : (FINDABLE_2A, FINDABLE_4S | FINDABLE_3S1A | FINDABLE_2S, False)
+}
+
+# Number of Hcal sections i.e. back, top, bottom, left and right
+HCAL_SECTIONS = 5
+
+# Species the products of a photonuclear reaction are counted in when 
+# classifying an event i.e. neutrons, protons, charged pions and neutral 
+# pions.  Everything else is counted as exotic.  Counts above 
+# MAX_SPECIES_COUNT are treated the same by the classification.
+CLASSIFY_SPECIES = [2112, 2212, 211, 111]
+N_SPECIES = len(CLASSIFY_SPECIES) + 1
+MAX_SPECIES_COUNT = 3
+
+# Number of Ecal layers
+ECAL_LAYERS = 34
+
+# Layers (inclusive) summed by the Ecal trigger and the energy (MeV) the sum 
+# needs to stay below for an event to pass
+TRIGGER_LAYERS = (1, 20)
+TRIGGER_THRESHOLD = 1500.
+
+def decode_layer(ids): 
+    
+    # Extract the layer field from an array of detector IDs.  The layout of
+    # the ID follows ldmx::DefaultDetectorID i.e. the subdetector occupies
+    # bits 0-3 and the layer bits 4-11.
+    return (ids & 0xFF0) >> 4
+
+def decode_hcal_section(ids): 
+    
+    # Extract the section field (bits 12-14) from an array of Hcal IDs
+    return (ids & 0x7000) >> 12
+
+def event_index(offsets): 
+    
+    # Get the index of the event each value of a flattened batch belongs to
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def mask_offsets(mask, offsets): 
+
+    # Get the offsets delimiting each event after the values of a flattened
+    # batch have been selected using a mask i.e. values[mask]
+    selected = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(np.bincount(event_index(offsets)[mask], 
+                          minlength=len(offsets) - 1), out=selected[1:])
+    return selected
+
+def select_events(selected, offsets):
+
+    # Drop the events that aren't selected from a flattened batch.  The mask
+    # selecting the values of the remaining events is returned along with
+    # the offsets delimiting them.
+    counts = np.diff(offsets)[selected]
+    selected_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=selected_offsets[1:])
+    return np.repeat(selected, np.diff(offsets)), selected_offsets
+
+def take(values, index, default):
+
+    # Get the values at the given positions e.g. those found by
+    # segment_argmax.  Negative positions (nothing found) get the default.
+    result = np.full(len(index), default, dtype=np.float64)
+    found = index >= 0
+    result[found] = values[index[found]]
+    return result
+
+def segment_sum(values, offsets): 
+    return np.bincount(event_index(offsets), weights=values, 
+                       minlength=len(offsets) - 1)
+
+def segment_max(values, offsets, default=0): 
+   
+    result = np.full(len(offsets) - 1, default, dtype=np.float64)
+    
+    # Empty events are skipped since reduceat would return the value at the
+    # start of the next event for them.
+    filled = np.diff(offsets) > 0
+    if np.any(filled):
+        result[filled] = np.maximum.reduceat(values, offsets[:-1][filled])
+    
+    return result
+
+def group_argmax(values, groups, n_groups): 
+
+    # Get the position of the largest value within each group.  As with a 
+    # running maximum, the first of several equal values is chosen.  Groups 
+    # without any values are assigned -1.
+    result = np.full(n_groups, -1, dtype=np.int64)
+    if len(values) == 0: return result
+
+    # lexsort is stable so equal values keep their original order
+    order = np.lexsort((-values, groups))
+    sorted_groups = groups[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    result[sorted_groups[first]] = order[first]
+    
+    return result
+
+def segment_argmax(values, offsets): 
+
+    # Get the position of the largest value of each event within the 
+    # flattened batch.  Empty events are assigned -1.
+    return group_argmax(values, event_index(offsets), len(offsets) - 1)
+
+def sum_per_layer(layers, offsets, n_layers, weights=None): 
+
+    # Sum the weights (or count the hits if no weights are given) in each 
+    # layer of every event in a batch.  Layers are numbered starting from 1
+    # and hits outside of [1, n_layers] are ignored.  A 2D array of shape 
+    # (events, layers) is returned.
+    valid = (layers >= 1) & (layers <= n_layers)
+    key = (event_index(offsets)*n_layers + layers - 1)[valid].astype(np.int64)
+    if weights is not None: weights = weights[valid]
+    n_events = len(offsets) - 1
+
+    return np.bincount(key, weights=weights, 
+                       minlength=n_events*n_layers).reshape(-1, n_layers)
+
+def segment_first(mask, offsets): 
+
+    # Get the position of the first value of each event selected by the 
+    # mask.  Events without any selected values are assigned -1.
+    first = segment_argmax(mask.astype(np.int8), offsets)
+    first[first >= 0] = np.where(mask[first[first >= 0]], first[first >= 0], -1)
+    return first
+
+def segment_last(mask, offsets): 
+    
+    # Get the position of the last value of each event selected by the mask
+    positions = np.where(mask, np.arange(len(mask)), -1)
+    return segment_max(positions, offsets, default=-1).astype(np.int64)
 
 def get_kinetic_energy(particle): 
     return (particle.getEnergy() - particle.getMass())
@@ -49,93 +210,239 @@ def get_ap(particles):
     
     return aprime
 
-def calculate_w(particle, delta): 
+def get_findable_masks(batch): 
+
+    # Encode the strategies each findable track result can be found with as
+    # a bitmask and resolve the sim particle it's associated with.  The 
+    # particle indices point into the flattened SimParticles_sim collection.
+    key = ('findable_masks',)
+    if key not in batch.cache:
+        masks = None
+        for bit, member in FINDABLE_STRATEGIES:
+            flags, offsets = batch.get_jagged('FindableTracks_recon', member)
+            if masks is None: masks = np.zeros(len(flags), dtype=np.int64)
+            masks |= (flags != 0).astype(np.int64)*bit
 
-    pz = particle.getMomentum()[2]
-    p = la.norm(particle.getMomentum())
-    ke = get_kinetic_energy(particle)
+        particles = batch.get_ref_index('FindableTracks_recon', 'simParticle_',
+                                        'SimParticles_sim')
+        batch.cache[key] = (masks, particles, offsets)
+
+    return batch.cache[key]
+
+def get_recoil_mask(batch): 
+   
+    # Flag the recoil electrons of a batch i.e. electrons with a generator
+    # status of 1.  This is the columnar analogue of get_recoil_electrons.
+    pdg_id = batch.get_jagged('SimParticles_sim', 'pdgID_')[0]
+    status = batch.get_jagged('SimParticles_sim', 'genStatus_')[0]
+    return (pdg_id == 11) & (status == 1)
+
+def get_first_recoil_index(batch): 
+
+    # Position of the recoil electron of every event as found by the 
+    # photonuclear studies i.e. the first electron without any parents.
+    # Events without one are assigned -1.
+    pdg_id, offsets = batch.get_jagged('SimParticles_sim', 'pdgID_')
+    parent_count = np.diff(batch.get_ref_arrays('SimParticles_sim', 'parents_')[1])
+    return segment_first((pdg_id == 11) & (parent_count == 0), offsets)
+
+def get_pn_gamma_index(batch, recoils): 
+
+    # Columnar analogue of get_pn_gamma.  Given the index of a recoil 
+    # electron in each event, find its daughter whose first daughter was 
+    # created in a photonuclear reaction (process type 9).  Indices point 
+    # into the flattened SimParticles_sim collection and events without a 
+    # PN gamma are assigned -1.
+    graph = batch.get_particle_graph()
+
+    # Check whether the first daughter of every particle is a PN product
+    first = graph.first_daughter
+    is_pn_parent = np.zeros(graph.n_particles, dtype=bool)
+    is_pn_parent[first >= 0] = graph.process[first[first >= 0]] == 9
+
+    # Only the daughters of the recoil electrons are candidates
+    is_recoil = np.zeros(graph.n_particles, dtype=bool)
+    is_recoil[recoils[recoils >= 0]] = True
+    owner = np.repeat(np.arange(graph.n_particles), np.diff(graph.daughter_offsets))
+    candidate = is_recoil[owner] & is_pn_parent[graph.daughters]
+
+    pn_gamma = segment_first(candidate, graph.daughter_offsets[graph.offsets])
+    pn_gamma[pn_gamma >= 0] = graph.daughters[pn_gamma[pn_gamma >= 0]]
+    return pn_gamma
+
+def get_recoil_sp_hits(batch, recoils): 
+
+    # Get the target scoring plane hit associated with the recoil electron
+    # of each event.  Only hits created in the downstream scoring plane and
+    # with a positive pz momentum are considered.  Indices point into the
+    # flattened TargetScoringPlaneHits_sim collection and events without such
+    # a hit are assigned -1.
+    layer, offsets = batch.get_jagged('TargetScoringPlaneHits_sim', 'layerID_')
+    pz = batch.get_jagged('TargetScoringPlaneHits_sim', 'pz_')[0]
+    particle = batch.get_ref_index('TargetScoringPlaneHits_sim', 
+                                   'simParticle_', 'SimParticles_sim')
+
+    n_particles = batch.get_offsets('SimParticles_sim', 'pdgID_')[-1]
+    is_recoil = np.zeros(n_particles + 1, dtype=bool)
+    is_recoil[recoils[recoils >= 0]] = True
     
-    return 0.5*(p + ke)*(math.sqrt(1 + (delta*delta)) - delta*(pz/p))
+    # Unresolved particles (-1) map to the extra, always false, entry 
+    return segment_first(is_recoil[particle] & (layer == 2) & (pz > 0), 
+                         offsets)
 
-def get_findable_tracks_map(findable_tracks):
+def count_findable_tracks(batch, definitions): 
 
-    findable_dic = {}
-    loose_dic = {}
-    axial_dic = {}
+    # Classify the findable tracks of a batch according to a set of 
+    # definitions (see FINDABLE_DEFINITIONS) in a single pass.  A particle 
+    # associated with several track results is only counted once per 
+    # definition.  For each definition, the sorted indices of the particles 
+    # satisfying it and the number of such particles in each event are 
+    # returned.
+    key = ('findable_counts',) + tuple(sorted(definitions.items()))
+    if key in batch.cache: return batch.cache[key]
 
-    # Create a map between a sim particle and a findable track.
-    for findable_track in findable_tracks:
-        if (findable_track.is4sFindable() 
-            or findable_track.is3s1aFindable()
-                or findable_track.is2s2aFindable()):
-            findable_dic[findable_track.getSimParticle()] = findable_track
+    masks, particles, offsets = get_findable_masks(batch)
+    poffsets = batch.get_offsets('SimParticles_sim', 'pdgID_')
+    n_particles = max(poffsets[-1], 1)
+    
+    names = sorted(definitions.keys())
+    any_of = np.array([definitions[name][0] for name in names], dtype=np.int64)
+    none_of = np.array([definitions[name][1] for name in names], dtype=np.int64)
+    no_recoil = np.array([definitions[name][2] for name in names], dtype=bool)
 
-        if findable_track.is2sFindable(): 
-            loose_dic[findable_track.getSimParticle()] = findable_track   
+    # Evaluate every definition for every track at once
+    is_recoil = np.zeros(len(particles), dtype=bool)
+    if np.any(no_recoil): 
+        resolved = particles >= 0
+        recoils = get_first_recoil_index(batch)
+        is_recoil[resolved] = recoils[event_index(poffsets)[particles[resolved]]] == particles[resolved]
+    selected = (((masks[:, np.newaxis] & any_of) != 0) 
+                & ((masks[:, np.newaxis] & none_of) == 0)
+                & np.logical_not(is_recoil[:, np.newaxis] & no_recoil) 
+                & (particles[:, np.newaxis] >= 0))
+
+    # Remove duplicate particles within each definition
+    itrack, idefinition = np.nonzero(selected)
+    keys = np.unique(idefinition*n_particles + particles[itrack])
+    idefinition = keys//n_particles
+    iparticle = keys%n_particles
+
+    counts = np.bincount(
+            idefinition*batch.n_events + event_index(poffsets)[iparticle], 
+            minlength=len(names)*batch.n_events).reshape(len(names), -1)
+    
+    result = {}
+    for index, name in enumerate(names): 
+        result[name] = (iparticle[idefinition == index], counts[index])
+    
+    batch.cache[key] = result
+    return result
 
-        if findable_track.is2aFindable(): 
-            axial_dic[findable_track.getSimParticle()] = findable_track
+def emulate_trigger(batch, layer_ranges, thresholds): 
 
-    return findable_dic, loose_dic, axial_dic
+    # Emulate the Ecal layer-sum trigger for a batch using the readout hits.
+    # The energy of the hits in each of the (inclusive) layer ranges is 
+    # summed in a single pass using the cumulative energy per layer.  The 
+    # sums, of shape (events, ranges), are returned along with the trigger 
+    # decision for each range and threshold, of shape (events, ranges, 
+    # thresholds).  An event passes if its sum is below the threshold.
+    key = ('trigger', tuple(map(tuple, layer_ranges)), tuple(thresholds))
+    if key in batch.cache: return batch.cache[key]
+
+    ids, offsets = batch.get_jagged('ecalDigis_recon', 'id_')
+    energy = batch.get_jagged('ecalDigis_recon', 'energy_')[0]
+
+    layer_energy = sum_per_layer(decode_layer(ids), offsets, ECAL_LAYERS, energy)
+    cumulative = np.zeros((len(layer_energy), ECAL_LAYERS + 1))
+    np.cumsum(layer_energy, axis=1, out=cumulative[:, 1:])
+
+    layer_ranges = np.clip(np.asarray(layer_ranges, dtype=np.int64).reshape(-1, 2), 
+                           1, ECAL_LAYERS)
+    layer_sums = (cumulative[:, layer_ranges[:, 1]] 
+                  - cumulative[:, layer_ranges[:, 0] - 1])
+    passed = layer_sums[:, :, np.newaxis] < np.asarray(thresholds, dtype=np.float64)
+
+    batch.cache[key] = (layer_sums, passed)
+    return batch.cache[key]
+
+def count_species(pdg_id, ke, offsets, thresholds): 
+
+    # Count the particles of every event in a batch above each of the kinetic
+    # energy thresholds per species (see CLASSIFY_SPECIES) with a single 
+    # bincount.  A count matrix of shape (thresholds, events, species) is 
+    # returned.
+    species = np.full(len(pdg_id), N_SPECIES - 1, dtype=np.int64)
+    for code, pdg in enumerate(CLASSIFY_SPECIES):
+        species[np.abs(pdg_id) == pdg] = code
+
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    n_events = len(offsets) - 1
+    ithreshold, iparticle = np.nonzero(ke[np.newaxis, :] > thresholds[:, np.newaxis])
+    key = ((ithreshold*n_events + event_index(offsets)[iparticle])*N_SPECIES 
+           + species[iparticle])
+    
+    return np.bincount(key, minlength=len(thresholds)*n_events*N_SPECIES).reshape(
+            len(thresholds), n_events, N_SPECIES)
+
+def classify_counts(counts): 
+
+    # Map species counts (see count_species) to the event categories.  The 
+    # species are along the last axis. 
+    n, p, pi, pi0, exotic = [counts[..., code] for code in xrange(N_SPECIES)]
+    count = counts.sum(axis=-1)
+    species_count = (counts > 0).sum(axis=-1)
+
+    conditions = [
+        count == 0,
+        (n == 1) & (count - n == 0),
+        (n == 1) & (p == 1) & (count - n - p == 0),
+        (n == 2) & (count - n == 0),
+        (n >= 3) & (count - n == 0),
+        (pi == 1) & (count - pi == 0),
+        (pi == 1) & (p == 1) & (count - pi - p == 0),
+        (pi == 1) & (n == 1) & (count - pi - n == 0),
+        (pi == 2) & (count - pi == 0),
+        (pi0 == 1) & (count - pi0 == 0),
+        (p == 1) & (count - p == 0),
+        (p == 2) & (count - p == 0),
+        (exotic > 0) & (count - exotic == 0),
+        species_count >= 2
+    ]
+    categories = [0, 2, 9, 2, 3, 4, 7, 7, 5, 6, 8, 9, 10, 11]
+    
+    return np.select(conditions, categories, default=-9999)
+
+# The categories don't distinguish between more than MAX_SPECIES_COUNT 
+# particles of a species so the category of every combination of (clipped) 
+# counts can be tabulated once.  The table is indexed by the counts encoded 
+# in base MAX_SPECIES_COUNT + 1.
+CATEGORY_TABLE = classify_counts(
+        (np.arange((MAX_SPECIES_COUNT + 1)**N_SPECIES)[:, np.newaxis]
+         // (MAX_SPECIES_COUNT + 1)**np.arange(N_SPECIES)) 
+        % (MAX_SPECIES_COUNT + 1))
+
+def classify_events(pdg_id, ke, offsets, threshold): 
+   
+    # Vectorized version of classify_event.  The particles of every event in
+    # a batch above the kinetic energy threshold are counted per species 
+    # i.e. neutrons, protons, charged pions, neutral pions and everything
+    # else, and the counts are mapped to the same event categories using a 
+    # lookup table.  If a list of thresholds is given, the categories for 
+    # all of them are returned as an array of shape (thresholds, events).
+    counts = np.minimum(count_species(pdg_id, ke, offsets, threshold), 
+                        MAX_SPECIES_COUNT)
+    categories = CATEGORY_TABLE[
+            np.dot(counts, (MAX_SPECIES_COUNT + 1)**np.arange(N_SPECIES))]
+
+    if np.ndim(threshold) == 0: return categories[0]
+    return categories
 
 def classify_event(particles, threshold): 
+
+    # Classify a single event given its collection of particles
+    pdg_id = np.fromiter((particle.getPdgID() for particle in particles), 
+                         dtype=np.int64)
+    ke = np.fromiter((get_kinetic_energy(particle) for particle in particles),
+                     dtype=np.float64)
     
-    neutron_count = 0
-    proton_count = 0
-    pion_count = 0
-    pi0_count = 0
-    exotic_count = 0
-    for particle in particles: 
-        if get_kinetic_energy(particle) <= threshold: continue
-
-        pdgid = abs(particle.getPdgID())
-        if pdgid == 2112: neutron_count += 1
-        elif pdgid == 2212: proton_count += 1
-        elif pdgid == 211: pion_count += 1
-        elif pdgid == 111: pi0_count += 1
-        else: 
-            #print pdgid
-            exotic_count += 1
-
-    count = neutron_count + proton_count + pion_count + pi0_count + exotic_count
-    count_a = proton_count + pion_count + pi0_count + exotic_count
-    count_b = pion_count + pi0_count + exotic_count
-    count_c = proton_count + neutron_count + pi0_count + exotic_count
-    count_d = neutron_count + pi0_count + exotic_count
-    count_e = proton_count + pi0_count + exotic_count
-    count_f = neutron_count + proton_count + pion_count + exotic_count
-    count_g = neutron_count + pion_count + pi0_count + exotic_count
-    count_h = neutron_count + proton_count + pion_count + pi0_count
-    if count == 0: return 0
-    if neutron_count == 1: 
-            if (count_a == 0): return 2
-            elif (proton_count == 1) & (count_b == 0): return 9
-    if (neutron_count == 2) & (count_a == 0): return 2
-    if (neutron_count >= 3) & (count_a == 0): return 3
-    if (pion_count == 1):
-            if count_c == 0: return 4
-            elif (proton_count == 1) & (count_d == 0): return 7   
-            elif (neutron_count == 1) & (count_e == 0): return 7   
-    if (pion_count == 2) & (count_c == 0): return 5
-    if (pi0_count == 1) & (count_f == 0): return 6
-    if (proton_count == 1) & (count_g == 0): return 8 
-    if (proton_count == 2) & (count_g == 0): return 9
-    if (exotic_count > 0) & (count_h == 0): return 10
-
-    if ((neutron_count > 0) 
-        & ((proton_count > 0) or (pion_count > 0) 
-            or (pi0_count > 0) or (exotic_count > 0))): return 11
-    elif ((proton_count > 0) 
-        & ((neutron_count > 0) or (pion_count > 0) 
-            or (pi0_count > 0) or (exotic_count > 0))): return 11
-    elif ((pion_count > 0) 
-        & ((neutron_count > 0) or (proton_count > 0) 
-            or (pi0_count > 0) or (exotic_count > 0))): return 11
-    elif ((pi0_count > 0) 
-        & ((neutron_count > 0) or (proton_count > 0) 
-            or (pion_count > 0) or (exotic_count > 0))): return 11
-    elif ((exotic_count > 0) 
-        & ((neutron_count > 0) or (proton_count > 0) 
-            or (pion_count > 0) or (pi0_count > 0))): return 11
-
-    return -9999
+    return classify_events(pdg_id, ke, np.array([0, len(pdg_id)]), threshold)[0]
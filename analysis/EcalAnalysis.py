@@ -2,7 +2,7 @@
 from __future__ import division
 
 from numpy import linalg as la
-from rootpy.tree import Tree
+from NtupleWriter import NtupleWriter
 
 import AnalysisUtils as au
 
@@ -16,7 +16,7 @@ class EcalAnalysis(object):
     
     def initialize(self, params):
 
-        self.tree = Tree('ecal_ntuple', model=EcalEvent)
+        self.tree = NtupleWriter('ecal_ntuple', EcalEvent)
 
     def process(self, event):
     
@@ -1,5 +1,5 @@
 
-from rootpy.tree import Tree
+from NtupleWriter import NtupleWriter
 
 from EventModels import Event
 
@@ -8,8 +8,8 @@ class EventAnalysis(object):
     def __init__(self): 
         self.tree = None
 
-    def initialize(self): 
-        self.tree = Tree('event_ntuple', model=Event)
+    def initialize(self, params): 
+        self.tree = NtupleWriter('event_ntuple', Event)
         self.count = 0
 
     def process(self, event):
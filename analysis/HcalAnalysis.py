@@ -1,59 +1,136 @@
 
-from rootpy.tree import Tree
+import numpy as np
+import ROOT as r
 
+from rootpy.plotting import Graph
+from NtupleWriter import NtupleWriter
+
+import AnalysisUtils as au
 from EventModels import HcalEvent
 
-class HcalAnalysis(object): 
+class HcalAnalysis(object):
 
-    def __init__(self): 
+    def __init__(self):
         self.tree = None
 
-    def initialize(self, params): 
-        self.tree = Tree('hcal_ntuple', model=HcalEvent)
+    def initialize(self, params):
+        self.tree = NtupleWriter('hcal_ntuple', HcalEvent)
         self.event_count = 0
-        self.veto_count = 0
-
-    def process(self, event): 
-
-        self.event_count += 1
-        #print 'Event: %s' % self.event_count
-
-        hcal_hits = event.get_collection('hcalDigis_recon')
-
-        # Loop through all of the Hcal hits and calculate the total 
-        # photoelectrons in the event
-        total_pe = 0
-        total_pe_fid = 0
-        max_pe = 0
-        max_pe_fid = 0
-        max_pe_layer = 0
-        max_pe_layer_fid = 0
-        for hit in hcal_hits:
-            #if hcal_hit.getSection() == 0: 
-                #total_pe_fid += hcal_hit.getPE()
-                #if max_pe_fid < hcal_hit.getPE(): 
-                    #max_pe_fid = hcal_hit.getPE()
-                    #max_pe_layer_fid = hcal_hit.getLayer()
-            total_pe += hit.getPE()
-            max_pe = max(max_pe, hit.getPE())
-
-        self.tree.max_pe = max_pe
-        self.tree.max_pe_fid = max_pe_fid
-        self.tree.max_pe_layer = max_pe_layer
-        self.tree.max_pe_layer_fid = max_pe_layer_fid
-        self.tree.total_hits = hcal_hits.GetEntriesFast()
-        self.tree.total_pe = total_pe
-        self.tree.total_pe_fid = total_pe_fid
-
-        self.tree.passes_hcal_veto =  1
-        if max_pe >= 8: self.tree.passes_hcal_veto =  0
-        else: self.veto_count += 1
-        
-        self.tree.fill(reset=True)
+
+        # The veto efficiency is written to the directory that is current 
+        # when the analysis is set up, e.g. the output file, since writing 
+        # the ntuple or closing a Plotter can change it.
+        self.directory = r.gDirectory.CurrentDirectory()
+
+        # Max PE thresholds used by the veto.  An event passes a given
+        # threshold if all hits have fewer PE's than it.  The first threshold
+        # is the one used to set passes_hcal_veto.
+        self.thresholds = [8]
+        if 'hcal_veto_thresholds' in params:
+            self.thresholds = params['hcal_veto_thresholds']
+        self.thresholds = np.array(self.thresholds, dtype=np.float64)
+
+        self.veto_counts = np.zeros(len(self.thresholds), dtype=np.int64)
+
+        # Create a pass flag for each of the thresholds
+        self.veto_branches = [
+                'passes_hcal_veto_pe%s' % ('%g' % threshold).replace('.', 'p')
+                for threshold in self.thresholds]
+        self.tree.create_branches(
+                dict((branch, 'I') for branch in self.veto_branches))
+
+    def process_batch(self, batch):
+
+        self.event_count += batch.n_events
+
+        pe, offsets = batch.get_jagged('hcalDigis_recon', 'pe_')
+        ids = batch.get_jagged('hcalDigis_recon', 'id_')[0]
+        section = au.decode_hcal_section(ids)
+        layer = au.decode_layer(ids)
+        index = au.event_index(offsets)
+
+        # Total and max PE in the event
+        total_pe = au.segment_sum(pe, offsets)
+        max_pe = au.segment_max(pe, offsets)
+        max_pe_layer = np.zeros(batch.n_events)
+        imax = au.segment_argmax(pe, offsets)
+        max_pe_layer[imax >= 0] = layer[imax[imax >= 0]]
+
+        # Total and max PE in each of the sections.  The values are reduced
+        # using the event and section as a single key.
+        key = index*au.HCAL_SECTIONS + section
+        size = batch.n_events*au.HCAL_SECTIONS
+        section_total_pe = np.bincount(key, weights=pe, minlength=size)
+        section_max_pe = np.zeros(size)
+        np.maximum.at(section_max_pe, key, pe)
+        section_total_pe = section_total_pe.reshape(-1, au.HCAL_SECTIONS)
+        section_max_pe = section_max_pe.reshape(-1, au.HCAL_SECTIONS)
+
+        # The back Hcal (section 0) is used as the fiducial region
+        fid_pe = np.where(section == 0, pe, -1)
+        imax = au.segment_argmax(fid_pe, offsets)
+        fid = np.zeros(batch.n_events, dtype=bool)
+        fid[imax >= 0] = fid_pe[imax[imax >= 0]] >= 0
+        max_pe_layer_fid = np.zeros(batch.n_events)
+        max_pe_layer_fid[fid] = layer[imax[fid]]
+
+        # Total and max PE per layer, indexed by layer number
+        n_layers = 1
+        if layer.size: n_layers = layer.max() + 1
+        key = index*n_layers + layer
+        size = batch.n_events*n_layers
+        layer_total_pe = np.bincount(key, weights=pe, minlength=size)
+        layer_max_pe = np.zeros(size)
+        np.maximum.at(layer_max_pe, key, pe)
+        layer_total_pe = layer_total_pe.reshape(-1, n_layers)
+        layer_max_pe = layer_max_pe.reshape(-1, n_layers)
+
+        # Only store the layers up to the deepest one hit in each event
+        depth = au.segment_max(layer, offsets, default=-1).astype(np.int64) + 1
+
+        # Evaluate all of the veto thresholds at once
+        passes = max_pe[:, np.newaxis] < self.thresholds[np.newaxis, :]
+        self.veto_counts += passes.sum(axis=0)
+
+        # The layers of each event up to its depth, in the flat layout used
+        # for jagged columns
+        stored = np.arange(n_layers)[np.newaxis, :] < depth[:, np.newaxis]
+        layer_offsets = np.zeros(batch.n_events + 1, dtype=np.int64)
+        np.cumsum(depth, out=layer_offsets[1:])
+
+        columns = {
+            'max_pe' : max_pe,
+            'max_pe_fid' : section_max_pe[:, 0],
+            'max_pe_layer' : max_pe_layer,
+            'max_pe_layer_fid' : max_pe_layer_fid,
+            'total_hits' : np.diff(offsets),
+            'total_pe' : total_pe,
+            'total_pe_fid' : section_total_pe[:, 0],
+            'section_total_pe' : section_total_pe,
+            'section_max_pe' : section_max_pe,
+            'layer_total_pe' : (layer_total_pe[stored], layer_offsets),
+            'layer_max_pe' : (layer_max_pe[stored], layer_offsets),
+            'passes_hcal_veto' : passes[:, 0]
+        }
+        for ithreshold, branch in enumerate(self.veto_branches):
+            columns[branch] = passes[:, ithreshold]
+
+        self.tree.fill_batch(batch.n_events, columns)
 
     def finalize(self):
 
         self.tree.write()
-        
-        print '[ HcalAnalysis ]: Total Events that have a max PE < 8: %s' % self.veto_count
-            
+
+        # Persist the veto efficiency as a function of the max PE threshold
+        efficiency = Graph(len(self.thresholds), name='hcal_veto_efficiency',
+                           title='Hcal Veto Efficiency')
+        for ithreshold, threshold in enumerate(self.thresholds):
+            eff = 0
+            if self.event_count > 0:
+                eff = self.veto_counts[ithreshold]/float(self.event_count)
+            efficiency.SetPoint(ithreshold, threshold, eff)
+
+            print '[ HcalAnalysis ]: Total Events that have a max PE < %g: %s (%.4f)' % (
+                    threshold, self.veto_counts[ithreshold], eff)
+        self.directory.cd()
+        efficiency.Write()
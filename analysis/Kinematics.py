@@ -0,0 +1,62 @@
+
+import numpy as np
+
+# Electron mass and beam energy in MeV
+ELECTRON_MASS = 0.5109989461
+BEAM_ENERGY = 4000
+
+# All functions operate element-wise on arrays of momentum components (or
+# scalars) so the kinematics of all particles of a batch can be computed at
+# once.
+
+def kinetic_energy(energy, mass):
+    return energy - mass
+
+def momentum(px, py, pz):
+    return np.sqrt(px*px + py*py + pz*pz)
+
+def pt(px, py):
+    return np.sqrt(px*px + py*py)
+
+def theta(px, py, pz, degrees=False):
+
+    # Polar angle with respect to the beam (z) axis
+    angle = np.arctan2(pt(px, py), pz)
+    if degrees: return np.degrees(angle)
+    return angle
+
+def phi(px, py, degrees=False):
+
+    angle = np.arctan2(py, px)
+    if degrees: return np.degrees(angle)
+    return angle
+
+def eta(px, py, pz):
+
+    # Pseudorapidity following the conventions of TVector3::Eta() for
+    # particles along the beam axis.
+    transverse = pt(px, py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(transverse == 0, np.sign(pz)*10e10,
+                        np.arcsinh(pz/transverse))
+
+def w(ke, p, pz, delta):
+
+    # W = (p + T)/2 (sqrt(1 + delta^2) - delta cos(theta)).  If delta is an
+    # array, W is evaluated for every particle and value of delta i.e. the
+    # result has the shape of the particles followed by that of delta.
+    delta = np.asarray(delta, dtype=np.float64)
+    extra = (Ellipsis,) + (np.newaxis,)*delta.ndim
+    ke, p, pz = np.asarray(ke)[extra], np.asarray(p)[extra], np.asarray(pz)[extra]
+    return 0.5*(p + ke)*(np.sqrt(1 + delta*delta) - delta*(pz/p))
+
+def transfer(px, py, pz, beam_energy=BEAM_ENERGY, mass=ELECTRON_MASS):
+
+    # Calculate the energy of the recoil electrons along with the momentum
+    # (q, q^2) and energy (omega) transferred relative to the incident
+    # electron.
+    energy = np.sqrt(px*px + py*py + pz*pz + mass*mass)
+    dz = np.sqrt(beam_energy*beam_energy - mass*mass) - pz
+    q2 = px*px + py*py + dz*dz
+
+    return energy, np.sqrt(q2), q2, beam_energy - energy
@@ -1,178 +1,164 @@
 
-import math
-import ROOT as r
+import numpy as np
 
-from rootpy.tree import Tree
+from NtupleWriter import NtupleWriter
 
-from numpy import linalg as la
 import AnalysisUtils as au
-from EventModels import PhotoNuclearEvent
+import Kinematics as kin
+from EventModels import PhotoNuclearEvent, PhotoNuclearHadron
 
-class PhotoNuclearAnalysis(object): 
-
-    def __init__(self): 
-   
-        self.tree = None
-
-    def initialize(self, params): 
-        self.tree = Tree('pn_ntuple', model=PhotoNuclearEvent)
-
-    def process(self, event):
-
-        #self.event_count += 1
-        #print "################################################\n"
-
-        #print "#                   Event %s                   #\n" % self.event_count
-        #print "################################################\n"
-
-        # Get the collection of MC particles from the event.
-        particles = event.get_collection('SimParticles_sim')
-
-        # Search the list of sim particles for the recoil electron. If it isn't 
-        # found, throw an exception
-        recoil_e = au.get_recoil_electrons(particles)[0]
-
-        # Persist the electron vertex
-        self.tree.recoil_e_vx = recoil_e.getVertex()[0]
-        self.tree.recoil_e_vy = recoil_e.getVertex()[1]
-        self.tree.recoil_e_vz = recoil_e.getVertex()[2]
-
-        # Retrieve the collection ot target scoring plane hits.  
-        sp_hits = event.get_collection('TargetScoringPlaneHits_sim')
-
-        # Create a list of all scoring plane hits associated with the recoil
-        # electron.  Only hits created in the downstream scoring plane and 
-        # with a position pz momentum are considered.
-        recoil_sp_hits = [sp_hit for sp_hit in sp_hits if (
-                            (sp_hit.getSimParticle() == recoil_e) & 
-                            (sp_hit.getLayerID() == 2) & 
-                            (sp_hit.getMomentum()[2] > 0)
-                          )]
-       
-        if len(recoil_sp_hits) == 0: 
-            print 'Missing recoil electron. Skipping event.'
-            return
-
-        pvec = recoil_sp_hits[0].getMomentum()
-        pvec = r.TVector3(pvec[0], pvec[1], pvec[2])
-        recoil_e_p = pvec.Mag()
-        
-        self.tree.recoil_e_p = recoil_e_p
-        self.tree.recoil_e_px = pvec.Px()
-        self.tree.recoil_e_py = pvec.Py()
-        self.tree.recoil_e_pz = pvec.Pz()
-        self.tree.recoil_e_pt = pvec.Pt()
+# Species the leading hadron is looked for
+LEAD_SPECIES = [('p', 2212), ('n', 2112), ('pi', 211), ('pi0', 111)]
 
+class PhotoNuclearAnalysis(object):
 
-        # Calculate the energy of the recoil electron
-        m_e = 0.5109989461
-        recoil_e_energy = math.sqrt(pvec.Mag()*pvec.Mag() + m_e*m_e)
+    def __init__(self):
 
-        self.tree.recoil_e_energy = recoil_e_energy
-
-        # Recoil electron polar angle 
-        self.tree.recoil_e_theta = pvec.Theta()*(180/math.pi)
-
-        # Create a vector denoting the incident electron momentum
-        in_e_pvec = r.TVector3(0, 0, math.sqrt(4000*4000 - m_e*m_e))
-
-        # Calculate the momentum transfer
-        self.tree.q = (in_e_pvec - pvec).Mag()
-
-        # Calculate the energy transfer
-        self.tree.omega = 4000 - recoil_e_energy
+        self.tree = None
 
-        # Use the recoil electron to retrieve the gamma that underwent a 
+    def initialize(self, params):
+        self.tree = NtupleWriter('pn_ntuple', PhotoNuclearEvent)
+
+        # Energy of the incident electron (MeV) used to calculate the 
+        # momentum and energy transfer
+        self.beam_energy = params.get('beam_energy', kin.BEAM_ENERGY)
+
+        # If enabled, the hadrons are written to a separate table instead of
+        # vectors of the event table.  Event level quantities are then only
+        # stored once per event.
+        self.hadron_tree = None
+        if params.get('hadron_table', False):
+            self.hadron_tree = NtupleWriter('pn_hadron_ntuple', PhotoNuclearHadron)
+        self.entry = 0
+
+    def process_batch(self, batch):
+
+        # Get the MC particles of the batch.
+        pdg_id, offsets = batch.get_jagged('SimParticles_sim', 'pdgID_')
+        process = batch.get_jagged('SimParticles_sim', 'processType_')[0]
+        energy = batch.get_jagged('SimParticles_sim', 'energy_')[0]
+        mass = batch.get_jagged('SimParticles_sim', 'mass_')[0]
+        px = batch.get_jagged('SimParticles_sim', 'px_')[0]
+        py = batch.get_jagged('SimParticles_sim', 'py_')[0]
+        pz = batch.get_jagged('SimParticles_sim', 'pz_')[0]
+        vx = batch.get_jagged('SimParticles_sim', 'x_')[0]
+        vy = batch.get_jagged('SimParticles_sim', 'y_')[0]
+        vz = batch.get_jagged('SimParticles_sim', 'z_')[0]
+        end_z = batch.get_jagged('SimParticles_sim', 'endZ_')[0]
+
+        # Search the sim particles for the recoil electron of every event. If
+        # it isn't found, throw an exception
+        recoil_e = au.segment_first(au.get_recoil_mask(batch), offsets)
+        if np.any(recoil_e < 0):
+            raise RuntimeError('Recoil electron was not found!')
+
+        # Retrieve the target scoring plane hit associated with the recoil
+        # electron.
+        recoil_sp_hit = au.get_recoil_sp_hits(batch, recoil_e)
+
+        # Use the recoil electron to retrieve the gamma that underwent a
         # photonuclear reaction.
-        pn_gamma = au.get_pn_gamma([recoil_e])
-
-        pn_gamma_pvec = pn_gamma.getMomentum()
-
-        self.tree.pn_gamma_energy     = pn_gamma.getEnergy()
-        self.tree.pn_gamma_int_z      = pn_gamma.getEndPoint()[2]
-        self.tree.pn_gamma_vertex_z   = pn_gamma.getVertex()[2]
-
-        pn_particles = [particle for particle in particles if (
-            (particle.getPdgID() != 22) &
-            (particle.getPdgID() < 10000) &
-            (particle.getProcessType() == 9))]
-
-        self.tree.pn_particle_mult = len(pn_particles)
-
-        var = { 'h_nucleon_ke':-9999, 'h_nucleon_theta':-9999, 
-                'h_nucleon_pdg':-9999,'h_p_ke':-9999, 'h_p_theta':-9999, 
-                'h_n_ke':-9999, 'h_n_theta':-9999, 'h_pi_ke':-9999, 
-                'h_pi_theta':-9999, 'h_pi0_ke':-9999, 'h_pi0_theta':-9999
+        pn_gamma = au.get_pn_gamma_index(batch, recoil_e)
+
+        valid = recoil_sp_hit >= 0
+        if np.any(valid & (pn_gamma < 0)):
+            raise RuntimeError('PN gamma was not found!')
+
+        # Recoil electron kinematics at the scoring plane
+        isp = recoil_sp_hit[valid]
+        recoil_px = batch.get_jagged('TargetScoringPlaneHits_sim', 'px_')[0][isp]
+        recoil_py = batch.get_jagged('TargetScoringPlaneHits_sim', 'py_')[0][isp]
+        recoil_pz = batch.get_jagged('TargetScoringPlaneHits_sim', 'pz_')[0][isp]
+        recoil_pt = kin.pt(recoil_px, recoil_py)
+        recoil_p = kin.momentum(recoil_px, recoil_py, recoil_pz)
+        recoil_theta = kin.theta(recoil_px, recoil_py, recoil_pz, degrees=True)
+
+        # Calculate the energy of the recoil electron along with the 
+        # momentum and energy transfer
+        recoil_energy, q, q2, omega = kin.transfer(
+                recoil_px, recoil_py, recoil_pz, self.beam_energy)
+
+        # Select the PN particles of all events
+        is_pn = (pdg_id != 22) & (pdg_id < 10000) & (process == 9)
+        pn_offsets = au.mask_offsets(is_pn, offsets)
+        pn_pdg_id = pdg_id[is_pn]
+        pn_theta = kin.theta(px[is_pn], py[is_pn], pz[is_pn], degrees=True)
+        pn_ke = kin.kinetic_energy(energy[is_pn], mass[is_pn])
+
+        # Find the leading hadron overall and of each species with a
+        # segmented argmax.  Each species of each event is its own segment.
+        lead = au.segment_argmax(pn_ke, pn_offsets)
+        species = np.full(len(pn_pdg_id), len(LEAD_SPECIES), dtype=np.int64)
+        for code, (name, pdg) in enumerate(LEAD_SPECIES):
+            species[np.abs(pn_pdg_id) == pdg] = code
+        n_groups = len(LEAD_SPECIES) + 1
+        lead_species = au.group_argmax(
+                pn_ke, au.event_index(pn_offsets)*n_groups + species,
+                batch.n_events*n_groups).reshape(-1, n_groups)
+
+        event_type = au.classify_events(pn_pdg_id, pn_ke, pn_offsets, 200)
+
+        n_missing = batch.n_events - np.count_nonzero(valid)
+        if n_missing:
+            print 'Missing recoil electron. Skipping %s events.' % n_missing
+
+        # Only keep the hadrons of the events with a recoil electron
+        is_kept, kept_offsets = au.select_events(valid, pn_offsets)
+        n_hadrons = np.diff(kept_offsets)
+
+        irecoil = recoil_e[valid]
+        igamma = pn_gamma[valid]
+        ilead = lead[valid]
+        columns = {
+            'recoil_e_vx' : vx[irecoil],
+            'recoil_e_vy' : vy[irecoil],
+            'recoil_e_vz' : vz[irecoil],
+            'recoil_e_p' : recoil_p,
+            'recoil_e_px' : recoil_px,
+            'recoil_e_py' : recoil_py,
+            'recoil_e_pz' : recoil_pz,
+            'recoil_e_pt' : recoil_pt,
+            'recoil_e_energy' : recoil_energy,
+            'recoil_e_theta' : recoil_theta,
+            'q' : q,
+            'omega' : omega,
+            'pn_gamma_energy' : energy[igamma],
+            'pn_gamma_int_z' : end_z[igamma],
+            'pn_gamma_vertex_z' : vz[igamma],
+            'pn_particle_mult' : n_hadrons,
+            'lead_hadron_ke' : au.take(pn_ke, ilead, -9999),
+            'lead_hadron_theta' : au.take(pn_theta, ilead, -9999),
+            'lead_hadron_pdg_id' : au.take(pn_pdg_id, ilead, -9999),
+            'event_type' : event_type[valid]
         }
-        
-        for particle in pn_particles:
-           
-            #particle.Print()
-
-            pvec = particle.getMomentum()
-            vec = r.TVector3(pvec[0], pvec[1], pvec[2])
-
-            # Calculate the polar angle
-            theta = vec.Theta()*180/math.pi
-            self.tree.hadron_theta.push_back(theta)
-            
-            self.tree.hadron_omega.push_back(self.tree.omega)
-            self.tree.hadron_recoil_pt.push_back(self.tree.recoil_e_pt)
-            self.tree.hadron_q.push_back(self.tree.q)
-
-            # Calculate the kinetic energy
-            ke = au.get_kinetic_energy(particle)
-            self.tree.hadron_ke.push_back(ke)
-
-            pdg = abs(particle.getPdgID())
-            self.tree.hadron_pdgid.push_back(particle.getPdgID())
-
-            if var['h_nucleon_ke'] < ke: 
-                var['h_nucleon_ke'] = ke
-                var['h_nucleon_theta'] = theta
-                var['h_nucleon_pdg'] = particle.getPdgID()
-
-            # Calculate the weight
-            weight = particle.getEnergy()
-
-            if pdg == 2112: 
-                weight = ke
-                if var['h_n_ke'] < ke: 
-                    var['h_n_ke'] = ke
-                    var['h_n_theta'] = theta
-            elif pdg == 2212: 
-                weight = ke
-                if var['h_p_ke'] < ke: 
-                    var['h_p_ke'] = ke
-                    var['h_p_theta'] = theta
-            elif pdg == 211: 
-                if var['h_pi_ke'] < ke: 
-                    var['h_pi_ke'] = ke
-                    var['h_pi_theta'] = theta
-            elif pdg == 111: 
-                if var['h_pi0_ke'] < ke: 
-                    var['h_pi0_ke'] = ke
-                    var['h_pi0_theta'] = theta
-
-            
-        self.tree.lead_hadron_ke     = var['h_nucleon_ke']
-        self.tree.lead_hadron_theta  = var['h_nucleon_theta']
-        self.tree.lead_hadron_pdg_id = var['h_nucleon_pdg']
-        self.tree.lead_p_ke          = var['h_p_ke']
-        self.tree.lead_p_theta       = var['h_p_theta']
-        self.tree.lead_n_ke          = var['h_n_ke']
-        self.tree.lead_n_theta       = var['h_n_theta']
-        self.tree.lead_pi_ke         = var['h_pi_ke']
-        self.tree.lead_pi_theta      = var['h_pi_theta']
-        self.tree.lead_pi0_ke        = var['h_pi0_ke']
-        self.tree.lead_pi0_theta     = var['h_pi0_theta']
-
-        event_type = au.classify_event(pn_particles, 200)
-        self.tree.event_type = event_type
-
-        self.tree.fill(reset=True)
-
-    def finalize(self): 
+        for code, (name, pdg) in enumerate(LEAD_SPECIES):
+            ilead = lead_species[valid, code]
+            columns['lead_%s_ke' % name] = au.take(pn_ke, ilead, -9999)
+            columns['lead_%s_theta' % name] = au.take(pn_theta, ilead, -9999)
+
+        if self.hadron_tree:
+            # Each hadron is a row tagged with the entry of its event
+            hadron_event = au.event_index(kept_offsets)
+            self.hadron_tree.fill_batch(len(hadron_event), {
+                'event' : self.entry + hadron_event,
+                'ke' : pn_ke[is_kept],
+                'theta' : pn_theta[is_kept],
+                'pdgid' : pn_pdg_id[is_kept]
+            })
+        else:
+            columns.update({
+                'hadron_theta' : (pn_theta[is_kept], kept_offsets),
+                'hadron_omega' : (np.repeat(omega, n_hadrons), kept_offsets),
+                'hadron_recoil_pt' : (np.repeat(recoil_pt, n_hadrons), kept_offsets),
+                'hadron_q' : (np.repeat(q, n_hadrons), kept_offsets),
+                'hadron_ke' : (pn_ke[is_kept], kept_offsets),
+                'hadron_pdgid' : (pn_pdg_id[is_kept], kept_offsets)
+            })
+
+        self.tree.fill_batch(len(irecoil), columns)
+        self.entry += len(irecoil)
+
+    def finalize(self):
 
         self.tree.write()
-
+        if self.hadron_tree: self.hadron_tree.write()
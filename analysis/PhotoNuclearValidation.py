@@ -3,116 +3,132 @@ from __future__ import division
 import numpy as np
 import Plotter
 
-class PhotoNuclearValidation(object):
+# Theta windows (degrees) the kinetic energy of the hardest hadron is
+# plotted in
+THETA_WINDOWS = [(25, 35), (55, 65), (85, 95), (115, 125), (155, 165)]
 
-    def __init__(self):
-        self.initialize()
+# Number of entries buffered before they are added to the histograms
+BUFFER_SIZE = 10000
 
-    def initialize(self):
-        self.events = []
+class PhotoNuclearValidation(object):
 
-        self.hardest_hadron_ke  = []
-        self.hardest_hadron_mwp = []
-        self.hardest_hadron_fwp = []
-        self.hardest_hadron_theta = []
-        
-        self.weight = []
+    def __init__(self):
+        self.histograms = None
+
+    def initialize(self, params):
+
+        # All histograms are booked up front and filled as events are
+        # processed so memory use doesn't depend on the size of the sample.
+        # The histograms only hold bin counts so those from several workers
+        # can be combined using merge.
+        self.histograms = Plotter.Histograms()
+        for name in ['ke', 'p', 'mwp', 'fwp']:
+            self.histograms.book(name, 250, 0, 4500, name)
+            self.histograms.book('%s_theta_100' % name, 250, 0, 4500, 
+                                 '%s_theta_100' % name)
+        for theta_min, theta_max in THETA_WINDOWS:
+            name = 'ke_theta_%s_%s' % (theta_min, theta_max)
+            self.histograms.book(name, 250, 0, 4500, name)
+        self.histograms.book('theta', 359, 0, 180, 'theta')
+        self.histograms.book('weight', 99, 0, 2, 'weight')
+        self.histograms.book('weight_theta_100', 99, 0, 2, 'weight_theta_100')
+
+        self.buffer = []
 
     def process(self, event):
-        
-        # Get the collection of MC particles from the event
-        particles = event.get_collection('SimParticles_sim')
 
         weights = event.get_collection('pnWeight_recon')
 
         for weight in weights:
-            if weight.getKineticEnergy() < 100: continue    
-            self.hardest_hadron_ke.append(weight.getKineticEnergy())
-            self.hardest_hadron_mwp.append(weight.getMeasuredWp())
-            self.hardest_hadron_fwp.append(weight.getFitWp())
-            self.hardest_hadron_theta.append(weight.getTheta())
-            self.weight.append(weight.getWeight())
+            if weight.getKineticEnergy() < 100: continue
+            self.buffer.append((weight.getKineticEnergy(),
+                                weight.getMeasuredWp(),
+                                weight.getFitWp(),
+                                weight.getTheta(),
+                                weight.getWeight()))
+
+        if len(self.buffer) >= BUFFER_SIZE: self.flush()
+
+    def fill(self, name, values):
+        self.histograms.fill(name, values)
+
+    def flush(self):
+
+        # Add the buffered entries to the histograms
+        if not self.buffer: return
+        ke, mwp, fwp, theta, weight = np.array(self.buffer).T
+        self.buffer = []
+
+        p = np.sqrt(np.power(ke, 2) + 2*ke*938.272)
+
+        theta_cut = theta > 100
+        for name, values in [('ke', ke), ('p', p), ('mwp', mwp),
+                             ('fwp', fwp), ('weight', weight)]:
+            self.fill(name, values)
+            self.fill('%s_theta_100' % name, values[theta_cut])
+
+        for theta_min, theta_max in THETA_WINDOWS:
+            self.fill('ke_theta_%s_%s' % (theta_min, theta_max),
+                      ke[(theta > theta_min) & (theta < theta_max)])
+
+        self.fill('theta', theta)
+
+    def merge(self, other):
+
+        # Combine the histograms filled by another instance e.g. one that
+        # processed a different set of files.
+        self.flush()
+        other.flush()
+        self.histograms.merge(other.histograms)
+
+    def plot(self, plt, names, **params):
+        plt.plot_histograms([self.histograms[name] for name in names],
+                            ylog=True, **params)
 
     def finalize(self):
+
+        self.flush()
+
         plt = Plotter.Plotter('pn_validation')
 
-        self.hardest_hadron_ke = np.array(self.hardest_hadron_ke)
-        self.hardest_hadron_mwp = np.array(self.hardest_hadron_mwp)
-        self.hardest_hadron_fwp = np.array(self.hardest_hadron_fwp)
-        self.hardest_hadron_theta = np.array(self.hardest_hadron_theta)
-        self.weight = np.array(self.weight)
-       
-        plt.plot_hists([self.hardest_hadron_ke, 
-                        self.hardest_hadron_ke[self.hardest_hadron_theta > 100]
-                       ], 
-                      np.linspace(0, 4500, 251), 
-                      labels=['All', '$\theta > 100$'],
-                      ylog=True, 
-                      x_label='$T_{p}$ (MeV)')
-
-        plt.plot_hists([np.sqrt(np.power(self.hardest_hadron_ke, 2) + 2*self.hardest_hadron_ke*938.272), 
-                        np.sqrt(np.power(self.hardest_hadron_ke, 2) + 2*self.hardest_hadron_ke*938.272)[self.hardest_hadron_theta > 100]
-                       ], 
-                      np.linspace(0, 4500, 251), 
-                      labels=['All', '$\theta > 100$'],
-                      ylog=True, 
-                      x_label='$p$ (MeV)')
-
-        plt.plot_hists([self.hardest_hadron_ke[(self.hardest_hadron_theta > 25) &
-                                               (self.hardest_hadron_theta < 35) 
-                                              ],
-                        self.hardest_hadron_ke[(self.hardest_hadron_theta > 55) &
-                                               (self.hardest_hadron_theta < 65) 
-                                              ],
-                        self.hardest_hadron_ke[(self.hardest_hadron_theta > 85) &
-                                               (self.hardest_hadron_theta < 95) 
-                                              ],
-                        self.hardest_hadron_ke[(self.hardest_hadron_theta > 115) &
-                                               (self.hardest_hadron_theta < 125) 
-                                              ],
-                        self.hardest_hadron_ke[(self.hardest_hadron_theta > 155) &
-                                               (self.hardest_hadron_theta < 165)
-                                              ]
-                       ], 
-                      np.linspace(0, 4500, 251), 
-                      labels=['30 degrees', '60 degrees', 
-                              '90 degrees', '120 degrees', '160 degrees'],
-                      ylog=True, 
-                      x_label='$T_{p}$ (MeV)')
+        self.plot(plt, ['ke', 'ke_theta_100'],
+                  labels=['All', '$\\theta > 100$'],
+                  x_label='$T_{p}$ (MeV)')
 
-        x = np.linspace(0, 4500, 251)
-        y = 17803.2*np.exp(-0.00807561*(x - 791.244))  
-        plt.plot_hists([self.hardest_hadron_mwp,
-                        self.hardest_hadron_mwp[self.hardest_hadron_theta > 100]
-                       ],
-                      np.linspace(0, 4500, 251), 
-                      labels=['All', '$\theta > 100$'],
-                      ylog=True, 
-                      x_label='Measured $W_{p}$ (MeV)')
+        self.plot(plt, ['p', 'p_theta_100'],
+                  labels=['All', '$\\theta > 100$'],
+                  x_label='$p$ (MeV)')
 
+        self.plot(plt, ['ke_theta_%s_%s' % window for window in THETA_WINDOWS],
+                  labels=['30 degrees', '60 degrees',
+                          '90 degrees', '120 degrees', '160 degrees'],
+                  x_label='$T_{p}$ (MeV)')
+
+        self.plot(plt, ['mwp', 'mwp_theta_100'],
+                  labels=['All', '$\\theta > 100$'],
+                  x_label='Measured $W_{p}$ (MeV)')
+
+        x = np.linspace(0, 4500, 251)
+        y = 17803.2*np.exp(-0.00807561*(x - 791.244))
         plt.plot_graph(x, y, 0, 0,
                        ylog=True,
                        x_label='Fit $W_{p}$ (MeV)')
 
-        plt.plot_hists([self.hardest_hadron_fwp,
-                        self.hardest_hadron_fwp[self.hardest_hadron_theta > 100]
-                       ],
-                      np.linspace(0, 4500, 251), 
-                      labels=['All', '$\theta > 100$'],
-                      ylog=True, 
-                      x_label='Fit $W_{p}$ (MeV)')
-        
-        plt.plot_hist(self.hardest_hadron_theta, 
-                      np.linspace(0, 180, 360), 
-                      ylog=True, 
-                      x_label='$\theta$ (degrees)')
-
-        plt.plot_hists([self.weight,
-                        self.weight[self.hardest_hadron_theta > 100]
-                       ],
-                      np.linspace(0, 2, 100), 
-                      labels=['All', '$\theta > 100$'],
-                      ylog=True, 
-                      x_label='PN Weight')
+        self.plot(plt, ['fwp', 'fwp_theta_100'],
+                  labels=['All', '$\\theta > 100$'],
+                  x_label='Fit $W_{p}$ (MeV)')
+
+        self.plot(plt, ['theta'],
+                  labels=['All'],
+                  x_label='$\\theta$ (degrees)')
+
+        self.plot(plt, ['weight', 'weight_theta_100'],
+                  labels=['All', '$\\theta > 100$'],
+                  x_label='PN Weight')
+
+        # Persist the bin counts so the output of several jobs can be
+        # combined e.g. using hadd.
+        for name in sorted(self.histograms.names):
+            plt.write_histogram(self.histograms[name])
 
         plt.close()
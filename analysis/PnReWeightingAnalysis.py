@@ -1,11 +1,14 @@
 from __future__ import division
 
 import numpy as np
-import math
+import sys
 import ROOT as r
 import Plotter
 
-from numpy import linalg as la
+import AnalysisUtils as au
+import Kinematics as kin
+
+from ColumnAccumulator import ColumnAccumulator
 
 class PnReWeightingAnalysis:
 
@@ -14,7 +17,7 @@ class PnReWeightingAnalysis:
 
     def initialize(self): 
         
-        self.ntuple = {}
+        self.ntuple = ColumnAccumulator()
         self.variables = [
             'events', 
             'pn_mult',
@@ -28,40 +31,30 @@ class PnReWeightingAnalysis:
             'hw_nucleons_theta', 'hw_nucleons_ke', 
         ]
 
-        self.delta_variables = []
-        delta = .1
-        for idelta in xrange(25):
-            self.delta_variables.extend(
-                    ['nucleon_ke_delta_%s' % delta, 
-                     'nucleon_theta_delta_%s' % delta, 
-                     'nucleon_w_delta_%s' % delta])
-            delta += .1
-
-        self.theta_variables = { 
-            'chnucleon_ke_theta':{}, 'chproton_ke_theta':{}, 'chneutron_ke_theta':{},  
-            'chnucleon_w_theta':{}, 'chproton_w_theta':{}, 'chneutron_w_theta':{},  
-            'chw_nucleon_theta':{}, 'chw_proton_theta':{}, 'chw_neutron_theta':{}
-        }
-
-        theta = 20
-        for itheta in xrange(0, 8):
-            for ptype in ['nucleon', 'proton', 'neutron']:
-                self.variables.append('%s_ke_theta_%s_%s' % (ptype, theta, theta + 20))
-                self.variables.append('%s_w_theta_%s_%s' % (ptype, theta, theta + 20))
-                self.variables.append('h%s_ke_theta_%s_%s' % (ptype, theta, theta + 20))
-                self.variables.append('h%s_w_theta_%s_%s' % (ptype, theta, theta + 20))
-                self.variables.append('hw_%s_theta_%s_%s' % (ptype, theta, theta + 20))
-
-            for key in self.theta_variables: 
-                self.theta_variables[key]['theta_%s_%s' % (theta, theta + 20)] = -9999
+        # W is evaluated for every nucleon over a grid of delta values
+        self.deltas = np.arange(1, 26)*.1
 
-            theta += 20
+        # Edges of the theta slices (degrees) the hardest nucleons are 
+        # found in
+        self.theta_edges = np.arange(20, 181, 20)
+        n_slices = len(self.theta_edges) - 1
 
+        # Particle level variables hold the values of all nucleons of an 
+        # event while the variables of the leading (h) nucleons hold a single
+        # value per event.
         for variable in self.variables: 
-            self.ntuple[variable] = []
+            jagged = not ((variable in ['events', 'pn_mult']) 
+                          or variable.startswith('h'))
+            self.ntuple.add_column(variable, 
+                    jagged=(jagged or (variable == 'hw_nucleons_all')))
         
-        for variable in self.delta_variables: 
-            self.ntuple[variable] = []
+        self.ntuple.add_column('nucleon_theta_slice', np.int64, jagged=True)
+        self.ntuple.add_column('nucleon_w_delta', jagged=True, 
+                               shape=(len(self.deltas),))
+        for ptype in ['nucleon', 'proton', 'neutron']:
+            self.ntuple.add_column('h%s_ke_theta' % ptype, shape=(n_slices,))
+            self.ntuple.add_column('h%s_w_theta' % ptype, shape=(n_slices,))
+            self.ntuple.add_column('hw_%s_theta' % ptype, shape=(n_slices,))
 
         self.colors = [r.kAzure + 2, r.kGreen - 2, r.kRed + 2, r.kOrange + 8,
                        r.kMagenta - 4, r.kAzure + 10, r.kYellow, r.kBlack, r.kRed]
@@ -69,11 +62,6 @@ class PnReWeightingAnalysis:
         self.event_count = 0
         self.file_prefix = None
 
-    def reset_variables(self): 
-        for var_key in self.theta_variables:
-            for key in self.theta_variables[var_key]:
-                self.theta_variables[var_key][key] = -9999
-
     def process(self, event):
 
         self.event_count += 1
@@ -91,167 +79,113 @@ class PnReWeightingAnalysis:
         
         if event_weight < 1.0: print 'PN weight: %s' % float(event_weight)
 
-        sim_particles = event.get_collection('SimParticles_sim')
-
-        recoil_e = None
-        for sim_particle in sim_particles:
-            if ((sim_particle.getPdgID() == 11) 
-                    & (sim_particle.getParentCount() == 0)):
-                recoil_e = sim_particle
-                #print '[ PnReWeightAnalysis ]: Recoil e- found.'
-                break
-
-        if not recoil_e: sys.exit('[ PnReWeightingAnalysis ]: Failed to find recoil e-.')
-
-        pn_gamma = None
-        for idaughter in xrange(recoil_e.getDaughterCount()): 
-            daughter = recoil_e.getDaughter(idaughter)
-            if daughter.getDaughterCount() == 0: continue
-            if daughter.getDaughter(0).getProcessType() == 9: 
-                pn_gamma = daughter
-                break
-
-        if not pn_gamma: sys.exit('[ PnReWeightingAnalysis ]: Failed to find PN gamma.')
-        
-
-
-        #print '[ PnReWeightAnalysis ]: Photo-nuclear multiplicity: %s' % pn_gamma.getDaughterCount()
-        self.ntuple['pn_mult'].append(pn_gamma.getDaughterCount())
+        # The particles of the event are looked up in the particle graph of 
+        # the batch it belongs to
+        graph = event.get_batch().get_particle_graph()
+        particles = graph.get_event(event.get_batch_entry())
+
+        recoil_e = np.flatnonzero((graph.pdg_id[particles] == 11) 
+                                  & (graph.parent_count[particles] == 0))
+        if not len(recoil_e): sys.exit('[ PnReWeightingAnalysis ]: Failed to find recoil e-.')
+        recoil_e = particles.start + recoil_e[0]
+
+        # The PN gamma is the first daughter of the recoil whose own first 
+        # daughter was created in a photonuclear reaction
+        daughters = graph.get_daughters(recoil_e)
+        first = graph.first_daughter[daughters]
+        pn_gamma = daughters[first >= 0][graph.process[first[first >= 0]] == 9]
+        if not len(pn_gamma): sys.exit('[ PnReWeightingAnalysis ]: Failed to find PN gamma.')
+        pn_gamma = pn_gamma[0]
+
+        #print '[ PnReWeightAnalysis ]: Photo-nuclear multiplicity: %s' % graph.daughter_count[pn_gamma]
+        self.ntuple['pn_mult'].append(graph.daughter_count[pn_gamma])
        
-        self.reset_variables()        
-
-        hnucleon_ke = -9999
-        hnucleon_theta = -9999
-        hw = -9999
-        hnucleon = None
-
-        hproton_ke = -9999
-        hproton_theta = -9999
-        hw_proton = -9999
-        hproton = None
-
-        hneutron_ke = -9999
-        hneutron_theta = -9999
-        hw_neutron = -9999
-        hneutron = None
-
-        for idaughter in xrange(pn_gamma.getDaughterCount()): 
-            
-            daughter = pn_gamma.getDaughter(idaughter)
-            ke = daughter.getEnergy() - daughter.getMass()
-            pvec = daughter.getMomentum()
-            p = la.norm(pvec)
-            theta = math.acos(pvec[2]/p)*180/3.14159
-            pdg_id = abs(daughter.getPdgID())
-            w = self.calculate_w(daughter, 0.5)
+        # Get the kinematics of all nucleons produced in the PN reaction
+        # The kinematics table is indexed by the position of the particle 
+        # within the event
+        kinematics = event.get_kinematics()
+        daughters = graph.get_daughters(pn_gamma) - particles.start
+        pdg_id = np.abs(kinematics['pdg_id'][daughters]).astype(np.int64)
+        daughters = daughters[(pdg_id == 2212) | (pdg_id == 2112)]
         
-            if ((pdg_id == 2212) or (pdg_id == 2112)): 
-                
-                self.ntuple['nucleon_ke'].append(ke)
-                self.ntuple['nucleon_theta'].append(theta)
-                self.ntuple['nucleon_w'].append(w)
-                self.ntuple['nucleon_weights'].append(event_weight)              
-                
-                delta = .1
-                for idelta in xrange(25):
-                    self.ntuple['nucleon_w_delta_%s' % delta].append(
-                        self.calculate_w(daughter, delta))
-
-                    delta += .1
-
-                if ke > hnucleon_ke: 
-                    hnucleon_ke = ke
-                    hnucleon = daughter
-                    hnucleon_theta = theta
-                
-                if pdg_id ==2212: 
-                
-                    self.ntuple['proton_ke'].append(ke)
-                    self.ntuple['proton_theta'].append(theta)
-                    self.ntuple['proton_w'].append(w)
-                    
-                    if ke > hproton_ke:
-                        hproton_ke = ke
-                        hproton = daughter
-                        hproton_theta = theta
-                    
-                    if w > hw_proton: 
-                        hw_proton = w
-
-                if pdg_id ==2112: 
-                    
-                    self.ntuple['neutron_ke'].append(ke)
-                    self.ntuple['neutron_theta'].append(theta)
-                    self.ntuple['neutron_w'].append(w)
-                    
-                    if ke > hneutron_ke:
-                        hneutron_ke = ke
-                        hneutron = daughter
-                        hneutron_theta = theta
-
-                    if w > hw_neutron:
-                        hw_neutron = w
-
-                if w > hw: 
-                    hw = w
-
-               
-                if (theta >= 20) & (theta < 40):
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 20, 40)
-                elif (theta >= 40) & (theta < 60):
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 40, 60)
-                elif (theta >= 60) & (theta < 80): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 60, 80)
-                elif (theta >= 80) & (theta < 100): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 80, 100)
-                elif (theta >= 100) & (theta < 120): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 100, 120)
-                elif (theta >= 120) & (theta < 140): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 120, 140)
-                elif (theta >= 140) & (theta < 160): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 140, 160)
-                elif (theta >= 160) & (theta < 180): 
-                    self.fill_angular_plots(pdg_id, ke, w, theta, 160, 180)
-        
-        self.ntuple['hnucleon_ke'].append(hnucleon_ke)
-        self.ntuple['hnucleon_theta'].append(hnucleon_theta)
-        if hnucleon: self.ntuple['hnucleon_w'].append(self.calculate_w(hnucleon, 0.5))
-        else: self.ntuple['hnucleon_w'].append(-9999)
-        self.ntuple['hproton_ke'].append(hproton_ke)
-        self.ntuple['hproton_theta'].append(hproton_theta)
-        if hproton: self.ntuple['hproton_w'].append(self.calculate_w(hproton, 0.5))
-        else: self.ntuple['hproton_w'].append(-9999)
-        self.ntuple['hneutron_ke'].append(hneutron_ke)
-        self.ntuple['hneutron_theta'].append(hneutron_theta)
-        if hneutron: self.ntuple['hneutron_w'].append(self.calculate_w(hneutron, 0.5))
-        else: self.ntuple['hneutron_w'].append(-9999)
-
-        self.ntuple['hw_nucleons'].append(hw)
-        self.ntuple['hw_nucleons_all'].append(hw_proton)
-        self.ntuple['hw_nucleons_all'].append(hw_neutron)
-        if hw_proton == -9999: hw_proton = 0
-        if hw_neutron == -9999: hw_neutron = 0
-        self.ntuple['hw_nucleons_sum'].append(hw_proton + hw_neutron)
+        pdg_id = np.abs(kinematics['pdg_id'][daughters]).astype(np.int64)
+        ke = kinematics['ke'][daughters]
+        p = kinematics['p'][daughters]
+        pz = kinematics['pz'][daughters]
+        theta = np.degrees(kinematics['theta'][daughters])
+
+        # W for delta = 0.5 and for the whole grid of deltas at once
+        w = kin.w(ke, p, pz, 0.5)
+        w_delta = kin.w(ke, p, pz, self.deltas)
+
+        # Slice the nucleons in theta.  Nucleons outside of the slices are 
+        # assigned -1.
+        n_slices = len(self.theta_edges) - 1
+        theta_slice = np.digitize(theta, self.theta_edges) - 1
+        theta_slice[theta_slice >= n_slices] = -1
+
+        self.ntuple['nucleon_ke'].extend(ke)
+        self.ntuple['nucleon_theta'].extend(theta)
+        self.ntuple['nucleon_w'].extend(w)
+        self.ntuple['nucleon_weights'].extend(np.full(len(ke), event_weight))
+        self.ntuple['nucleon_w_delta'].extend(w_delta)
+        self.ntuple['nucleon_theta_slice'].extend(theta_slice)
+
+        hw = {}
+        for ptype, selected in [('nucleon', np.ones(len(ke), dtype=bool)), 
+                                ('proton', pdg_id == 2212), 
+                                ('neutron', pdg_id == 2112)]:
+            
+            index = np.nonzero(selected)[0]
+            if ptype != 'nucleon':
+                self.ntuple['%s_ke' % ptype].extend(ke[index])
+                self.ntuple['%s_theta' % ptype].extend(theta[index])
+                self.ntuple['%s_w' % ptype].extend(w[index])
+
+            # Hardest nucleon and highest W over all angles
+            hardest_ke, hardest_theta, hardest_w = -9999, -9999, -9999
+            hw[ptype] = -9999
+            if len(index): 
+                hardest = index[np.argmax(ke[index])]
+                hardest_ke = ke[hardest]
+                hardest_theta = theta[hardest]
+                hardest_w = w[hardest]
+                hw[ptype] = w[index].max()
+
+            self.ntuple['h%s_ke' % ptype].append(hardest_ke)
+            self.ntuple['h%s_theta' % ptype].append(hardest_theta)
+            self.ntuple['h%s_w' % ptype].append(hardest_w)
+
+            # Hardest nucleon and highest W within each theta slice
+            index = index[theta_slice[index] >= 0]
+            ihard = au.group_argmax(ke[index], theta_slice[index], n_slices)
+            ihw = au.group_argmax(w[index], theta_slice[index], n_slices)
+            
+            ke_theta = np.full(n_slices, -9999.)
+            w_theta = np.full(n_slices, -9999.)
+            hw_theta = np.full(n_slices, -9999.)
+            ke_theta[ihard >= 0] = ke[index[ihard[ihard >= 0]]]
+            w_theta[ihard >= 0] = w[index[ihard[ihard >= 0]]]
+            hw_theta[ihw >= 0] = w[index[ihw[ihw >= 0]]]
+            
+            self.ntuple['h%s_ke_theta' % ptype].append(ke_theta)
+            self.ntuple['h%s_w_theta' % ptype].append(w_theta)
+            self.ntuple['hw_%s_theta' % ptype].append(hw_theta)
 
-        theta = 20
-        for itheta in xrange(0, 8): 
-            for ptype in ['nucleon', 'proton', 'neutron']:
-                self.ntuple['h%s_ke_theta_%s_%s' % (ptype, theta, theta + 20)].append(
-                        self.theta_variables['ch%s_ke_theta' % ptype]['theta_%s_%s' % (theta, theta + 20)])
-                self.ntuple['h%s_w_theta_%s_%s' % (ptype, theta, theta + 20)].append(
-                        self.theta_variables['ch%s_w_theta' % ptype]['theta_%s_%s' % (theta, theta + 20)])
-                self.ntuple['hw_%s_theta_%s_%s' % (ptype, theta, theta + 20)].append(
-                        self.theta_variables['chw_%s_theta' % ptype]['theta_%s_%s' % (theta, theta + 20)])
+        self.ntuple['hw_nucleons'].append(hw['nucleon'])
+        self.ntuple['hw_nucleons_all'].append(hw['proton'])
+        self.ntuple['hw_nucleons_all'].append(hw['neutron'])
+        self.ntuple['hw_nucleons_sum'].append(
+                max(hw['proton'], 0) + max(hw['neutron'], 0))
 
-            theta += 20
+        self.ntuple.end_event()
 
     def finalize(self):
 
         print 'Total: %s' % len(self.ntuple['hnucleon_ke'])
 
 
-        for variable in self.variables: 
-            self.ntuple[variable] = np.array(self.ntuple[variable])
+        self.ntuple = self.ntuple.arrays()
         
         plt = Plotter.Plotter(self.file_prefix + '_plots')
 
@@ -509,18 +443,19 @@ class PnReWeightingAnalysis:
         nucleon_w_theta_array = []
         labels = []
         for itheta in xrange(0, 8): 
-            nucleon_ke_theta_array.append(self.ntuple['nucleon_ke_theta_%s_%s' % (theta, theta + 20)]) 
-            nucleon_w_theta_array.append(self.ntuple['nucleon_w_theta_%s_%s' % (theta, theta + 20)]) 
+            in_slice = self.ntuple['nucleon_theta_slice'] == itheta
+            nucleon_ke_theta_array.append(self.ntuple['nucleon_ke'][in_slice]) 
+            nucleon_w_theta_array.append(self.ntuple['nucleon_w'][in_slice]) 
             labels.append('$%s \leq \theta < %s$' % (theta, theta + 20))
             
             plt.create_root_hist('nucleon_ke_theta_%s_%s' % (theta, theta + 20), 
-                             self.ntuple['nucleon_ke_theta_%s_%s' % (theta, theta + 20)], 
+                             nucleon_ke_theta_array[itheta], 
                              500, 0, 5000,
                              'Kinetic Energy, Inclusive, %s < #theta %s, (MeV)' % (theta, theta + 20), 
                              color=self.colors[itheta])
 
             plt.create_root_hist('nucleon_w_theta_%s_%s' % (theta, theta + 20), 
-                             self.ntuple['nucleon_w_theta_%s_%s' % (theta, theta + 20)], 
+                             nucleon_w_theta_array[itheta], 
                              500, 0, 5000,
                              'W, Inclusive, %s < #theta %s, (MeV)' % (theta, theta + 20), 
                              color=self.colors[itheta])
@@ -545,90 +480,52 @@ class PnReWeightingAnalysis:
            
             for pindex, ptype in enumerate(['nucleon', 'proton', 'neutron']):
 
-                plt.plot_hist(self.ntuple['h%s_ke_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                plt.plot_hist(self.ntuple['h%s_ke_theta' % ptype][:, itheta], 
                     np.linspace(0, 5000, 501), 
                     ylog=True,
                     x_label='Kinetic Energy, Hardest (%s < $\theta$ < %s) (MeV)' % (theta, theta + 20))
 
                 plt.create_root_hist('h%s_ke_theta_%s_%s' % (ptype, theta, theta + 20), 
-                                 self.ntuple['h%s_ke_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                                 self.ntuple['h%s_ke_theta' % ptype][:, itheta], 
                                  500, 0, 5000,
                                  'Kinetic Energy, Hardest (%s < #theta %s) (MeV)' % (theta, theta + 20), 
                                  color=self.colors[pindex])
 
-                plt.plot_hist(self.ntuple['h%s_w_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                plt.plot_hist(self.ntuple['h%s_w_theta' % ptype][:, itheta], 
                     np.linspace(0, 5000, 501), 
                     ylog=True,
                     x_label='W, Hardest (%s < $\theta$ < %s) (MeV)' % (theta, theta + 20))
 
                 plt.create_root_hist('h%s_w_theta_%s_%s' % (ptype, theta, theta + 20), 
-                                 self.ntuple['h%s_w_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                                 self.ntuple['h%s_w_theta' % ptype][:, itheta], 
                                  500, 0, 5000,
                                  'W, Hardest (%s < #theta %s) (MeV)' % (theta, theta + 20), 
                                  color=self.colors[pindex])
 
-                plt.plot_hist(self.ntuple['hw_%s_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                plt.plot_hist(self.ntuple['hw_%s_theta' % ptype][:, itheta], 
                     np.linspace(0, 5000, 501), 
                     ylog=True,
                     x_label='Highest W, %s < theta < %s (MeV)' % (theta, theta + 20))
 
                 plt.create_root_hist('hw_%s_theta_%s_%s' % (ptype, theta, theta + 20), 
-                                 self.ntuple['hw_%s_theta_%s_%s' % (ptype, theta, theta + 20)], 
+                                 self.ntuple['hw_%s_theta' % ptype][:, itheta], 
                                  500, 0, 5000,
                                  'Highest W, %s < theta < %s (MeV)' % (theta, theta + 20), 
                                  color=self.colors[pindex])
             
             theta = theta + 20
 
-        delta = .1
-        for idelta in xrange(25):
+        for idelta, delta in enumerate(self.deltas):
 
-            plt.plot_hist(self.ntuple['nucleon_w_delta_%s' % delta],
+            plt.plot_hist(self.ntuple['nucleon_w_delta'][:, idelta],
                           np.linspace(0, 5000, 501), 
                           ylog=True, 
-                          x_label='W, Inclusive, delta = %s (MeV)' % delta)
+                          x_label='W, Inclusive, delta = %g (MeV)' % delta)
 
-            plt.create_root_hist('nucleon_w_delta_%s' % delta,
-                                 self.ntuple['nucleon_w_delta_%s' % delta],
+            plt.create_root_hist('nucleon_w_delta_%g' % delta,
+                                 self.ntuple['nucleon_w_delta'][:, idelta],
                                  500, 0, 5000,
-                                 'W, Inclusive, delta = %s (MeV)' % delta, 
+                                 'W, Inclusive, delta = %g (MeV)' % delta, 
                                  color=self.colors[0])
 
-            delta += .1
-
         plt.close()
-
-    def calculate_w(self, particle, delta): 
-        pvec = particle.getMomentum()
-        p = la.norm(pvec)
-        ke = particle.getEnergy() - particle.getMass()
-        return 0.5*(p + ke)*(math.sqrt(1 + (delta*delta)) - delta*(pvec[2]/p))
-
-    def fill_angular_plots(self, pdg_id, ke, w, theta, theta_min, theta_max): 
-        
-        self.ntuple['nucleon_ke_theta_%s_%s' % (theta_min, theta_max)].append(ke)
-        self.ntuple['nucleon_w_theta_%s_%s' % (theta_min, theta_max)].append(w)
-
-        if ke > self.theta_variables['chnucleon_ke_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-             self.theta_variables['chnucleon_ke_theta']['theta_%s_%s' % (theta_min, theta_max)] = ke
-             self.theta_variables['chnucleon_w_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-
-        if w > self.theta_variables['chw_nucleon_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-            self.theta_variables['chw_nucleon_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-
-        if pdg_id == 2212: 
-            if ke > self.theta_variables['chproton_ke_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-                self.theta_variables['chproton_ke_theta']['theta_%s_%s' % (theta_min, theta_max)] = ke
-                self.theta_variables['chproton_w_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-
-            if w > self.theta_variables['chw_proton_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-                self.theta_variables['chw_proton_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-        
-        if pdg_id == 2112: 
-            if ke > self.theta_variables['chneutron_ke_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-                self.theta_variables['chneutron_ke_theta']['theta_%s_%s' % (theta_min, theta_max)] = ke
-                self.theta_variables['chneutron_w_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-
-            if w > self.theta_variables['chw_neutron_theta']['theta_%s_%s' % (theta_min, theta_max)]:
-                self.theta_variables['chw_neutron_theta']['theta_%s_%s' % (theta_min, theta_max)] = w
-
@@ -1,21 +1,21 @@
 from __future__ import division
 
-import math
 import ROOT as r
 import numpy as np
 import Plotter
 
-from numpy import linalg as la
+import Kinematics as kin
+
 from scipy.stats import norm
 
 class PrintEvent(object) :
 
     def calculate_w(self, particle): 
-        pvec = particle.getMomentum()
-        p = la.norm(pvec)
-        ke = particle.getEnergy() - particle.getMass()
-        theta = math.acos(pvec[2]/p)*180.0/3.14159 
-        return 0.5*(p + ke)*(1.12 - 0.5*(pvec[2]/p)), theta, p
+        px, py, pz = [particle.getMomentum()[i] for i in xrange(3)]
+        p = kin.momentum(px, py, pz)
+        ke = kin.kinetic_energy(particle.getEnergy(), particle.getMass())
+        theta = kin.theta(px, py, pz, degrees=True)
+        return kin.w(ke, p, pz, 0.5), theta, p
 
     def is_recoil(self, particle) : 
         return (particle.getPdgID() == 11) & (particle.getParentCount() == 0)
@@ -1,12 +1,12 @@
 
 from __future__ import division
 
-import math
+import numpy as np
 
-from numpy import linalg as la
-from rootpy.tree import Tree
+from NtupleWriter import NtupleWriter
 
 import AnalysisUtils as au
+import Kinematics as kin
 from EventModels import SignalEvent
 
 class SignalAnalysis:
@@ -14,52 +14,59 @@ class SignalAnalysis:
     def __init__(self): 
         self.tree = None
 
-    def initialize(self):
-        self.tree = Tree('signal_ntuple', model=SignalEvent)
+    def initialize(self, params):
+        self.tree = NtupleWriter('signal_ntuple', SignalEvent)
 
-    def process(self, event):
+    def process_batch(self, batch):
        
-        # Get the collection of MC particles from the event
-        particles = event.get_collection('SimParticles_sim')
-       
-        # Search the list of sim particles for the recoil electron. If it isn't 
-        # found, throw an exception
-        recoils = au.get_recoil_electrons(particles)
-        self.tree.n_electrons = len(recoils)
-
-        # Calculate the e- recoil truth momentum
-        for i, recoil in enumerate(recoils): 
-            recoil_e_tpvec  = recoil.getMomentum()
-            recoil_e_tp     = la.norm(recoil_e_tpvec)
-            recoil_e_tpt    = math.sqrt(recoil_e_tpvec[0]*recoil_e_tpvec[0] 
-                                      + recoil_e_tpvec[1]*recoil_e_tpvec[1])
+        # Get the MC particles of the batch
+        pdg_id, offsets = batch.get_jagged('SimParticles_sim', 'pdgID_')
+        status = batch.get_jagged('SimParticles_sim', 'genStatus_')[0]
         
-            self.tree.recoil_e_truth_p.push_back(recoil_e_tp)
-            self.tree.recoil_e_truth_pt.push_back(recoil_e_tpt)
-            self.tree.recoil_e_truth_px.push_back(recoil_e_tpvec[0])
-            self.tree.recoil_e_truth_py.push_back(recoil_e_tpvec[1])
-            self.tree.recoil_e_truth_pz.push_back(recoil_e_tpvec[2])
-
-            self.tree.recoil_e_vertex_x.push_back(recoil.getVertex()[0])
-            self.tree.recoil_e_vertex_y.push_back(recoil.getVertex()[1])
-            self.tree.recoil_e_vertex_z.push_back(recoil.getVertex()[2])
-
-            if recoil_e_tpt != 0: 
-                
-                self.tree.recoil_e_sig_p  = recoil_e_tp
-                self.tree.recoil_e_sig_pt = recoil_e_tpt
-                self.tree.recoil_e_sig_px = recoil_e_tpvec[0]
-                self.tree.recoil_e_sig_py = recoil_e_tpvec[1]
-                self.tree.recoil_e_sig_pz = recoil_e_tpvec[2]
-
-
-        # Get the A' mass 
-        aprime = au.get_ap(particles)
+        # Select the recoil electrons of all events at once.  The per 
+        # electron quantities are stored in the same flat layout delimited by
+        # eoffsets.
+        is_recoil = (pdg_id == 11) & (status == 1)
+        eoffsets = au.mask_offsets(is_recoil, offsets)
         
-        if not aprime:
-            raise RuntimeError("A' was not found.")
+        px = batch.get_jagged('SimParticles_sim', 'px_')[0][is_recoil]
+        py = batch.get_jagged('SimParticles_sim', 'py_')[0][is_recoil]
+        pz = batch.get_jagged('SimParticles_sim', 'pz_')[0][is_recoil]
+        vx = batch.get_jagged('SimParticles_sim', 'x_')[0][is_recoil]
+        vy = batch.get_jagged('SimParticles_sim', 'y_')[0][is_recoil]
+        vz = batch.get_jagged('SimParticles_sim', 'z_')[0][is_recoil]
 
-        self.tree.ap_mass =  aprime.getMass()
+        # Calculate the e- recoil truth momentum
+        pt = kin.pt(px, py)
+        p = kin.momentum(px, py, pz)
+
+        # The signal recoil is the last electron with a non-zero pT
+        sig = au.segment_last(pt != 0, eoffsets)
+
+        # Get the A' of each event i.e. the first particle with a PDG ID of 
+        # 622.
+        aprime = au.segment_first(pdg_id == 622, offsets)
+        if np.any(aprime < 0): 
+            raise RuntimeError("A' was not found.")
+        ap_mass = batch.get_jagged('SimParticles_sim', 'mass_')[0][aprime]
+
+        self.tree.fill_batch(batch.n_events, {
+            'n_electrons' : np.diff(eoffsets),
+            'recoil_e_truth_p' : (p, eoffsets),
+            'recoil_e_truth_pt' : (pt, eoffsets),
+            'recoil_e_truth_px' : (px, eoffsets),
+            'recoil_e_truth_py' : (py, eoffsets),
+            'recoil_e_truth_pz' : (pz, eoffsets),
+            'recoil_e_vertex_x' : (vx, eoffsets),
+            'recoil_e_vertex_y' : (vy, eoffsets),
+            'recoil_e_vertex_z' : (vz, eoffsets),
+            'recoil_e_sig_p' : au.take(p, sig, 0),
+            'recoil_e_sig_pt' : au.take(pt, sig, 0),
+            'recoil_e_sig_px' : au.take(px, sig, 0),
+            'recoil_e_sig_py' : au.take(py, sig, 0),
+            'recoil_e_sig_pz' : au.take(pz, sig, 0),
+            'ap_mass' : ap_mass
+        })
 
         '''
         #
@@ -159,8 +166,6 @@ class SignalAnalysis:
                         min = diff
         '''
 
-        self.tree.fill(reset=True)
-
     def finalize(self): 
       
         self.tree.write()
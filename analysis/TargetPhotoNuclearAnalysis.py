@@ -1,13 +1,32 @@
 from __future__ import division
 
-import math
 import ROOT as r
 import numpy as np
 import Plotter
 
-from numpy import linalg as la
+import AnalysisUtils as au
+import Kinematics as kin
+
+from ColumnAccumulator import ColumnAccumulator
+
 from scipy.stats import norm
 
+# Bits used to encode the selections passed by an event
+SINGLE_TRACK = 1
+ECAL_VETO = 2
+HCAL_VETO = 4
+
+# Selections each variable is plotted for along with the bits an event needs
+# to have set to pass them.  
+SELECTIONS = [
+    ('All', 0), 
+    ('Single track', SINGLE_TRACK), 
+    ('Hcal veto', HCAL_VETO), 
+    ('Ecal veto', ECAL_VETO), 
+    ('Basic veto', SINGLE_TRACK | ECAL_VETO | HCAL_VETO)
+]
+N_CATEGORIES = 8
+
 class TargetPhotoNuclearAnalysis(object) : 
 
     def __init__(self) : 
@@ -31,23 +50,43 @@ class TargetPhotoNuclearAnalysis(object) :
         
         return cuts, sig_eff
 
-    def is_recoil(self, particle) : 
-        return (particle.getPdgID() == 11) & (particle.getParentCount() == 0)
-
-    def created_within_target(self, particle) :
-        if abs(particle.getVertex()[2]) <= 0.550 : return True 
-        return False
+    def created_within_target(self, vz) :
+        return np.abs(vz) <= 0.550
   
-    def calculate_w(self, particle): 
-        pvec = particle.getMomentum()
-        p = la.norm(pvec)
-        ke = particle.getEnergy() - particle.getMass()
-        theta = math.acos(pvec[2]/p)*180.0/3.14159 
-        return 0.5*(p + ke)*(1.12 - 0.5*(pvec[2]/p)), theta
+    def plot_selections(self, plt, name, values, categories, bins, x_min, 
+                        x_max, x_label, root_label, root=True, **params):
+
+        # Histogram the values of all categories in a single pass and build 
+        # the histogram of each selection by summing the categories that pass
+        # it.  The same bin counts are used for both the PDF and ROOT output.
+        counts = Plotter.histogram(values, bins, x_min, x_max, categories, 
+                                   N_CATEGORIES)
+        edges = Plotter.edge_counts(values, x_max, categories, N_CATEGORIES)
+        codes = np.arange(N_CATEGORIES)
+        hists = [counts[(codes & bits) == bits].sum(axis=0) 
+                 for label, bits in SELECTIONS]
+        edges = [edges[(codes & bits) == bits].sum() for label, bits in SELECTIONS]
+
+        plt.plot_binned_hists([Plotter.displayed_counts(hist, edge) 
+                               for hist, edge in zip(hists, edges)],
+                              np.linspace(x_min, x_max, bins + 1),
+                              labels=[label for label, bits in SELECTIONS],
+                              ylog=True,
+                              x_label=x_label, 
+                              **params)
+        
+        if not root: return
+
+        for index, ((label, bits), hist) in enumerate(zip(SELECTIONS, hists)): 
+            hist_name = name
+            if bits: hist_name = '%s - %s' % (name, label)
+            plt.create_root_hist_from_counts(hist_name, hist, x_min, x_max, 
+                                             root_label, 
+                                             color=self.colors[index])
 
     def initialize(self) :
 
-        self.ntuple = {}
+        self.ntuple = ColumnAccumulator()
         self.variables = [
                 'events',
                 'pn_gamma_energy', 'pn_particle_mult', 'pn_interaction_z', 
@@ -66,8 +105,13 @@ class TargetPhotoNuclearAnalysis(object) :
             self.variables.append('total_recoil_hits_l%s' % (layer_n + 1))
             self.variables.append('total_charge_l%s' % (layer_n + 1))
 
+        # Hit level variables hold the values of all hits of an event
+        hit_variables = ['ecal_hit_energy', 'hcal_hit_energy']
         for variable in self.variables: 
-            self.ntuple[variable] = []
+            dtype = np.float64
+            if variable == 'events': dtype = np.int64
+            self.ntuple.add_column(variable, dtype, 
+                                   jagged=(variable in hit_variables))
     
         self.colors = [r.kAzure + 2, r.kRed + 2, r.kGreen + 2, r.kViolet + 6, r.kOrange + 7]
 
@@ -88,128 +132,64 @@ class TargetPhotoNuclearAnalysis(object) :
                     event.get_file_name().rfind('/') + 1:-5]
             print self.file_prefix
 
-        # Get the collection of MC particles from the even
-        particles = event.get_collection('SimParticles_sim')
+        # The particles of the event are looked up in the particle graph of 
+        # the batch it belongs to
+        graph = event.get_batch().get_particle_graph()
+        particles = graph.get_event(event.get_batch_entry())
         
-        # Loop through all of the sim particles in the event and find the recoil
-        # electron.  The recoil electron can then be used to obtain associated
-        # brem gamma involved in a PN reaction.
-        recoil_e = None
-        for particle in particles:
-            
-            # We only care to find the recoil for now
-            if particle.getPdgID() != 11: continue
-
-            # If the particle is found to be consistent with the recoil 
-            # electron, then tag it and skip searching
-            if self.is_recoil(particle):
-                recoil_e = particle
-                break
+        # Find the recoil electron.  The recoil electron can then be used to 
+        # obtain associated brem gamma involved in a PN reaction.
+        recoil_e = particles.start + np.flatnonzero(
+                (graph.pdg_id[particles] == 11) 
+                & (graph.parent_count[particles] == 0))[0]
 
         # Search for the PN gamma and use it to get the PN daughters
-        pn_gamma = None
-        for daughter_count in xrange(0, recoil_e.getDaughterCount()):
-            daughter = recoil_e.getDaughter(daughter_count)
-            if daughter.getDaughterCount() == 0: continue
+        daughters = graph.get_daughters(recoil_e)
+        first = graph.first_daughter[daughters]
+        daughters, first = daughters[first >= 0], first[first >= 0]
+        pn_gamma = daughters[(graph.pdg_id[daughters] == 22) 
+                             & self.created_within_target(graph.vz[daughters])
+                             & self.created_within_target(graph.vz[first])][0]
+        
+        self.ntuple['pn_gamma_energy'].append(graph.energy[pn_gamma])
+        self.ntuple['pn_particle_mult'].append(graph.daughter_count[pn_gamma])
+        self.ntuple['pn_interaction_z'].append(graph.end_z[pn_gamma])
+
+        # Kinematics of the PN daughters.  The table is indexed by the 
+        # position of the particle within the event.
+        kinematics = event.get_kinematics()
+        pn_daughters = graph.get_daughters(pn_gamma) - particles.start
+        pdg_id = np.abs(kinematics['pdg_id'][pn_daughters])
+        ke = kinematics['ke'][pn_daughters]
+        p = kinematics['p'][pn_daughters]
+        pz = kinematics['pz'][pn_daughters]
+        theta = np.degrees(kinematics['theta'][pn_daughters])
+        
+        # The leading hadron overall and of each species
+        for name, selected in [('hadron', np.ones(len(ke), dtype=bool)), 
+                               ('proton', pdg_id == 2212), 
+                               ('neutron', pdg_id == 2112), 
+                               ('pion', pdg_id == 211)]: 
             
-            if ((daughter.getPdgID() == 22) 
-                    & self.created_within_target(daughter)
-                    & self.created_within_target(daughter.getDaughter(0))):
-                pn_gamma = daughter
-                break
-        
-        self.ntuple['pn_gamma_energy'].append(pn_gamma.getEnergy())
-        self.ntuple['pn_particle_mult'].append(pn_gamma.getDaughterCount())
-        self.ntuple['pn_interaction_z'].append(pn_gamma.getEndPoint()[2])
-
-        lead_ke = -9999
-        lead_hadron = None
-        lead_proton_ke = -9999
-        lead_proton = None
-        lead_neutron_ke = -9999
-        lead_neutron = None
-        lead_pion_ke = -9999
-        lead_pion = None
-        max_w = -9999
-        max_w_theta = -9999
-        for pn_daughter_count in xrange(0, pn_gamma.getDaughterCount()): 
-            pn_daughter = pn_gamma.getDaughter(pn_daughter_count)
-            
-            ke = pn_daughter.getEnergy() - pn_daughter.getMass()
-            if lead_ke < ke: 
-                lead_ke = ke
-                lead_hadron = pn_daughter
-            
-            if ((abs(pn_daughter.getPdgID()) == 2212) & (lead_proton_ke < ke)):
-                lead_proton_ke = ke
-                lead_proton = pn_daughter
-            elif ((abs(pn_daughter.getPdgID()) == 2112) & (lead_neutron_ke < ke)):
-                lead_neutron_ke = ke
-                lead_neutron = pn_daughter
-            elif ((abs(pn_daughter.getPdgID()) == 211) & (lead_neutron_ke < ke)):
-                lead_pion_ke = ke
-                lead_pion = pn_daughter
+            lead_ke, lead_theta, lead_p, lead_pdgid = -9999, -9999, -9999, -9999
+            if np.any(selected): 
+                lead = np.flatnonzero(selected)[np.argmax(ke[selected])]
+                lead_ke, lead_theta, lead_p = ke[lead], theta[lead], p[lead]
+                lead_pdgid = kinematics['pdg_id'][pn_daughters[lead]]
+
+            self.ntuple['lead_%s_ke' % name].append(lead_ke)
+            self.ntuple['lead_%s_theta' % name].append(lead_theta)
+            self.ntuple['lead_%s_p' % name].append(lead_p)
+            if name == 'hadron': 
+                self.ntuple['lead_hadron_pdgid'].append(lead_pdgid)
+
+        max_w, max_w_theta = -9999, -9999
+        if len(ke): 
+            w = kin.w(ke, p, pz, 0.5)
+            max_w, max_w_theta = w.max(), theta[np.argmax(w)]
 
-            wp, theta = self.calculate_w(pn_daughter)
-            if wp > max_w: 
-                max_w = wp
-                max_w_theta = theta
-        
-        self.ntuple['lead_hadron_ke'].append(lead_ke)
-        self.ntuple['lead_proton_ke'].append(lead_proton_ke)
-        self.ntuple['lead_neutron_ke'].append(lead_neutron_ke)
-        self.ntuple['lead_pion_ke'].append(lead_pion_ke)
-        
         self.ntuple['max_w'].append(max_w)
         self.ntuple['max_w_theta'].append(max_w_theta)
-
-        pdgid = -9999
-        if lead_hadron == None: 
-            theta = -9999
-            p = -9999
-        else:
-            pvec = lead_hadron.getMomentum()
-            p = la.norm(pvec)
-            theta = math.acos(pvec[2]/p)*180.0/3.14159 
-            pdgid = lead_hadron.getPdgID()
-
-        self.ntuple['lead_hadron_theta'].append(theta)
-        self.ntuple['lead_hadron_p'].append(p)
-        self.ntuple['lead_hadron_pdgid'].append(pdgid)
-        
-        if lead_proton == None: 
-            theta = -9999
-            p = -9999
-        else:
-            pvec = lead_proton.getMomentum()
-            p = la.norm(pvec)
-            theta = math.acos(pvec[2]/p)*180.0/3.14159 
-
-        self.ntuple['lead_proton_theta'].append(theta)
-        self.ntuple['lead_proton_p'].append(p)
-
-        if lead_neutron == None: 
-            theta = -9999
-            p = -9999
-        else:
-            pvec = lead_neutron.getMomentum()
-            p = la.norm(pvec)
-            theta = math.acos(pvec[2]/p)*180.0/3.14159 
-
-        self.ntuple['lead_neutron_theta'].append(theta)
-        self.ntuple['lead_neutron_p'].append(p)
-
-
-        if lead_pion == None: 
-            theta = -9999
-            p = -9999
-        else:
-            pvec = lead_pion.getMomentum()
-            p = la.norm(pvec)
-            theta = math.acos(pvec[2]/p)*180.0/3.14159 
-
-        self.ntuple['lead_pion_theta'].append(theta)
-        self.ntuple['lead_pion_p'].append(p)
         
         #
         # Trigger Pads
@@ -230,29 +210,15 @@ class TargetPhotoNuclearAnalysis(object) :
         # 'Tracking'
         #
 
-        # Get the FindableTracks collection from the event
-        findable_tracks = event.get_collection('FindableTracks_recon')
-        findable_dic = {}
-        stub_dic = {}
-        axial_dic = {}
+        # Classify the findable tracks of the whole batch the event belongs to
+        # and look up the counts of this event.
+        findable = au.count_findable_tracks(event.get_batch(), 
+                                            au.PN_FINDABLE_DEFINITIONS)
+        ientry = event.get_batch_entry()
         
-        # Create a map between a sim particle and a findable track. This 
-        # particular map will only contain tracks that can be found using the
-        # 4s and 3s1a strategies.
-        for findable_track in findable_tracks:
-            if (findable_track.is4sFindable() or findable_track.is3s1aFindable()):
-                findable_dic[findable_track.getSimParticle()] = findable_track
-            elif findable_track.is2sFindable() & (findable_track.getSimParticle() != recoil_e):
-                stub_dic[findable_track.getSimParticle()] = findable_track
-            elif (findable_track.is2aFindable() 
-                    & (not findable_track.is4sFindable())
-                    & (not findable_track.is3s1aFindable()) 
-                    & (not findable_track.is2sFindable())):
-                axial_dic[findable_track.getSimParticle()] = findable_track
-
-        self.ntuple['track_count'].append(len(findable_dic))
-        self.ntuple['stub_count'].append(len(stub_dic))
-        self.ntuple['axial_count'].append(len(axial_dic))
+        self.ntuple['track_count'].append(findable['track'][1][ientry])
+        self.ntuple['stub_count'].append(findable['stub'][1][ientry])
+        self.ntuple['axial_count'].append(findable['axial'][1][ientry])
 
         #
         # Ecal
@@ -316,860 +282,105 @@ class TargetPhotoNuclearAnalysis(object) :
             self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)].append(hit_counter[layer_n])
             self.ntuple['total_charge_l%s' % (layer_n + 1)].append(charge_counter[layer_n])
 
+        self.ntuple.end_event()
+
     def finalize(self) :
 
-        for variable in self.variables: 
-            self.ntuple[variable] = np.array(self.ntuple[variable])
+        hit_offsets = dict((variable, self.ntuple.get_offsets(variable)) 
+                           for variable in ['ecal_hit_energy', 'hcal_hit_energy'])
+        self.ntuple = self.ntuple.arrays()
 
         plt = Plotter.Plotter(self.file_prefix + '_plots')
 
-        single_track = self.ntuple['track_count'] == 1
-        ecal_veto = self.ntuple['passes_ecal_veto'] == 1
-        hcal_veto = self.ntuple['passes_hcal_veto'] == 1
-        basic_veto = single_track & ecal_veto & hcal_veto
-        cuts = { 'Single track':single_track, 'Ecal veto':ecal_veto, 'Hcal veto':hcal_veto, 'Basic veto':basic_veto }
-
-        plt.plot_hists([
-                        self.ntuple['pn_gamma_energy'],
-                        self.ntuple['pn_gamma_energy'][single_track],
-                        self.ntuple['pn_gamma_energy'][hcal_veto],
-                        self.ntuple['pn_gamma_energy'][ecal_veto],
-                        self.ntuple['pn_gamma_energy'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      label_loc=2, 
-                      x_label='$E(\gamma)$ (MeV)')
-       
-        plt.create_root_hist('pn_gamma_energy', 
-                             self.ntuple['pn_gamma_energy'], 
-                             160, 0, 4000,
-                             'E(#gamma) (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('pn_gamma_energy - %s' % name, 
-                                 self.ntuple['pn_gamma_energy'][cut], 
-                                 160, 0, 4000,
-                                 'E(#gamma) (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['pn_particle_mult'],
-                        self.ntuple['pn_particle_mult'][single_track],
-                        self.ntuple['pn_particle_mult'][hcal_veto],
-                        self.ntuple['pn_particle_mult'][ecal_veto],
-                        self.ntuple['pn_particle_mult'][basic_veto],
-                       ],
-                      np.linspace(0, 120, 121),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='PN Multiplicity')
-         
-        plt.create_root_hist('pn_particle_mult', 
-                             self.ntuple['pn_particle_mult'], 
-                             120, 0, 120,
-                             'PN Multiplicity', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('pn_particle_mult - %s' % name, 
-                                 self.ntuple['pn_particle_mult'][cut], 
-                                 120, 0, 120,
-                                 'PN Multiplicity', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['pn_interaction_z'],
-                        self.ntuple['pn_interaction_z'][single_track],
-                        self.ntuple['pn_interaction_z'][hcal_veto],
-                        self.ntuple['pn_interaction_z'][ecal_veto],
-                        self.ntuple['pn_interaction_z'][basic_veto]
-                       ],
-                      np.linspace(-100, 350, 451),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='PN $\gamma$ Interaction Point z (mm)')
-
-        plt.plot_hists([
-                        self.ntuple['pn_interaction_z'],
-                        self.ntuple['pn_interaction_z'][single_track],
-                        self.ntuple['pn_interaction_z'][hcal_veto],
-                        self.ntuple['pn_interaction_z'][ecal_veto],
-                        self.ntuple['pn_interaction_z'][basic_veto]
-                       ],
-                      np.linspace(-1, 1, 451),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='PN $\gamma$ Interaction Point z (mm)')
-
-        plt.create_root_hist('pn_interaction_z', 
-                             self.ntuple['pn_interaction_z'], 
-                             450, -1, 1,
-                             'PN $\gamma$ Interaction Point z (mm)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('pn_interaction_z - %s' % name, 
-                                 self.ntuple['pn_interaction_z'][cut], 
-                                 450, -1, 1,
-                                 'PN $\gamma$ Interaction Point z (mm)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_hadron_ke'],
-                        self.ntuple['lead_hadron_ke'][single_track],
-                        self.ntuple['lead_hadron_ke'][hcal_veto],
-                        self.ntuple['lead_hadron_ke'][ecal_veto],
-                        self.ntuple['lead_hadron_ke'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading Hadron Kinetic Energy (MeV)')
-
-        plt.create_root_hist('lead_hadron_ke', 
-                             self.ntuple['lead_hadron_ke'], 
-                             160, 0, 4000,
-                             'Leading Hadron Kinetic Energy (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_hadron_ke - %s' % name, 
-                                 self.ntuple['lead_hadron_ke'][cut], 
-                                 160, 0, 4000,
-                                 'Leading Hadron Kinetic Energy (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_hadron_theta'],
-                        self.ntuple['lead_hadron_theta'][single_track],
-                        self.ntuple['lead_hadron_theta'][hcal_veto],
-                        self.ntuple['lead_hadron_theta'][ecal_veto],
-                        self.ntuple['lead_hadron_theta'][basic_veto]
-                       ],
-                      np.linspace(0, 180, 361),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading Hadron Theta (degrees)')
-
-        plt.create_root_hist('lead_hadron_theta', 
-                             self.ntuple['lead_hadron_theta'], 
-                             360, 0, 180,
-                             'Leading Hadron Theta (degrees)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_hadron_theta - %s' % name, 
-                                 self.ntuple['lead_hadron_theta'][cut], 
-                                 360, 0, 180,
-                                 'Leading Hadron Theta (degrees)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hist2d(self.ntuple['lead_hadron_ke'], 
-                        self.ntuple['lead_hadron_theta'], 
-                        np.linspace(0, 4000, 161),
-                        np.linspace(0, 180, 361),
-                        x_label='Leading Hadron Kinetic Energy (MeV)',
-                        y_label='Leading Hadron Theta (degrees)')
-
-        plt.plot_hists([
-                        self.ntuple['lead_hadron_p'],
-                        self.ntuple['lead_hadron_p'][single_track],
-                        self.ntuple['lead_hadron_p'][hcal_veto],
-                        self.ntuple['lead_hadron_p'][ecal_veto],
-                        self.ntuple['lead_hadron_p'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading Hadron Momentum (MeV)')
-
-        plt.create_root_hist('lead_hadron_p', 
-                             self.ntuple['lead_hadron_p'], 
-                             160, 0, 4000,
-                             'Leading Hadron Momentum (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_hadron_p - %s' % name, 
-                                 self.ntuple['lead_hadron_p'][cut], 
-                                 160, 0, 4000,
-                                 'Leading Hadron Momentum (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_hadron_pdgid'],
-                        self.ntuple['lead_hadron_pdgid'][single_track],
-                        self.ntuple['lead_hadron_pdgid'][hcal_veto],
-                        self.ntuple['lead_hadron_pdgid'][ecal_veto],
-                        self.ntuple['lead_hadron_pdgid'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading Hadron Momentum (MeV)')
-
-        plt.create_root_hist('lead_hadron_pdgid', 
-                             self.ntuple['lead_hadron_pdgid'], 
-                             160, 0, 4000,
-                             'Leading Hadron Momentum (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_hadron_pdgid - %s' % name, 
-                                 self.ntuple['lead_hadron_pdgid'][cut], 
-                                 160, 0, 4000,
-                                 'Leading Hadron Momentum (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_proton_ke'],
-                        self.ntuple['lead_proton_ke'][single_track],
-                        self.ntuple['lead_proton_ke'][hcal_veto],
-                        self.ntuple['lead_proton_ke'][ecal_veto],
-                        self.ntuple['lead_proton_ke'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $p$ Kinetic Energy (MeV)')
-
-        plt.create_root_hist('lead_proton_ke', 
-                             self.ntuple['lead_proton_ke'], 
-                             160, 0, 4000,
-                             'Leading #p Kinetic Energy (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_proton_ke - %s' % name, 
-                                 self.ntuple['lead_proton_ke'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #p Kinetic Energy (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_proton_theta'],
-                        self.ntuple['lead_proton_theta'][single_track],
-                        self.ntuple['lead_proton_theta'][hcal_veto],
-                        self.ntuple['lead_proton_theta'][ecal_veto],
-                        self.ntuple['lead_proton_theta'][basic_veto]
-                       ],
-                      np.linspace(0, 180, 361),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $p$ Theta (degrees)')
-
-        plt.create_root_hist('lead_proton_theta', 
-                             self.ntuple['lead_proton_theta'], 
-                             360, 0, 180,
-                             'Leading #p Theta (degrees)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_proton_theta - %s' % name, 
-                                 self.ntuple['lead_proton_theta'][cut], 
-                                 360, 0, 180,
-                                 'Leading #p Theta (degrees)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hist2d(self.ntuple['lead_proton_ke'], 
-                        self.ntuple['lead_proton_theta'], 
-                        np.linspace(0, 4000, 161),
-                        np.linspace(0, 180, 361),
-                        x_label='Leading $p$ Kinetic Energy (MeV)',
-                        y_label='Leading $p$ Theta (degrees)')
-
-        plt.plot_hists([
-                        self.ntuple['lead_proton_p'],
-                        self.ntuple['lead_proton_p'][single_track],
-                        self.ntuple['lead_proton_p'][hcal_veto],
-                        self.ntuple['lead_proton_p'][ecal_veto],
-                        self.ntuple['lead_proton_p'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $p$ Momentum (MeV)')
-
-        plt.create_root_hist('lead_proton_p', 
-                             self.ntuple['lead_proton_p'], 
-                             160, 0, 4000,
-                             'Leading #p Momentum (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_proton_p - %s' % name, 
-                                 self.ntuple['lead_proton_p'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #p Momentum (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_neutron_ke'],
-                        self.ntuple['lead_neutron_ke'][single_track],
-                        self.ntuple['lead_neutron_ke'][hcal_veto],
-                        self.ntuple['lead_neutron_ke'][ecal_veto],
-                        self.ntuple['lead_neutron_ke'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $n$ Kinetic Energy')
-
-        plt.create_root_hist('lead_neutron_ke', 
-                             self.ntuple['lead_neutron_ke'], 
-                             160, 0, 4000,
-                             'Leading #n Kinetic Energy (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_neutron_ke - %s' % name, 
-                                 self.ntuple['lead_neutron_ke'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #n Kinetic Energy (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_neutron_theta'],
-                        self.ntuple['lead_neutron_theta'][single_track],
-                        self.ntuple['lead_neutron_theta'][hcal_veto],
-                        self.ntuple['lead_neutron_theta'][ecal_veto],
-                        self.ntuple['lead_neutron_theta'][basic_veto]
-                       ],
-                      np.linspace(0, 180, 361),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $n$ Theta (degrees)')
-        
-        plt.create_root_hist('lead_neutron_theta', 
-                             self.ntuple['lead_neutron_theta'], 
-                             360, 0, 180,
-                             'Leading #n Theta (degrees)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_neutron_theta - %s' % name, 
-                                 self.ntuple['lead_neutron_theta'][cut], 
-                                 360, 0, 180,
-                                 'Leading #n Theta (degrees)',
-                                 color=self.colors[index])
-            index += 1
-
-
-        plt.plot_hist2d(self.ntuple['lead_neutron_ke'], 
-                        self.ntuple['lead_neutron_theta'], 
-                        np.linspace(0, 4000, 161),
-                        np.linspace(0, 180, 361),
-                        x_label='Leading $n$ Kinetic Energy (MeV)',
-                        y_label='Leading $n$ Theta (degrees)')
-        
-        plt.plot_hists([
-                        self.ntuple['lead_neutron_p'],
-                        self.ntuple['lead_neutron_p'][single_track],
-                        self.ntuple['lead_neutron_p'][hcal_veto],
-                        self.ntuple['lead_neutron_p'][ecal_veto],
-                        self.ntuple['lead_neutron_p'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $n$ Momentum (MeV)')
-
-        plt.create_root_hist('lead_neutron_p', 
-                             self.ntuple['lead_neutron_p'], 
-                             160, 0, 4000,
-                             'Leading #n Momentum (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_neutron_p - %s' % name, 
-                                 self.ntuple['lead_neutron_p'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #n Momentum (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_pion_ke'],
-                        self.ntuple['lead_pion_ke'][single_track],
-                        self.ntuple['lead_pion_ke'][hcal_veto],
-                        self.ntuple['lead_pion_ke'][ecal_veto],
-                        self.ntuple['lead_pion_ke'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $\pi$ Kinetic Energy')
-       
-        plt.create_root_hist('lead_pion_ke', 
-                             self.ntuple['lead_pion_ke'], 
-                             160, 0, 4000,
-                             'Leading #pi Kinetic Energy (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_pion_ke - %s' % name, 
-                                 self.ntuple['lead_pion_ke'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #pi Kinetic Energy (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['lead_pion_theta'],
-                        self.ntuple['lead_pion_theta'][single_track],
-                        self.ntuple['lead_pion_theta'][hcal_veto],
-                        self.ntuple['lead_pion_theta'][ecal_veto],
-                        self.ntuple['lead_pion_theta'][basic_veto]
-                       ],
-                      np.linspace(0, 180, 361),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $\pi$ Theta (degrees)')
-
-        
-        plt.create_root_hist('lead_pion_theta', 
-                             self.ntuple['lead_pion_theta'], 
-                             360, 0, 180,
-                             'Leading #pi Theta (degrees)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_pion_theta - %s' % name, 
-                                 self.ntuple['lead_pion_theta'][cut], 
-                                 360, 0, 180,
-                                 'Leading #pi Theta (degrees)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hist2d(self.ntuple['lead_pion_ke'], 
-                        self.ntuple['lead_pion_theta'], 
-                        np.linspace(0, 4000, 161),
-                        np.linspace(0, 180, 361),
-                        x_label='Leading $\pi$ Kinetic Energy (MeV)',
-                        y_label='Leading $\pi$ Theta (degrees)')
-
-        plt.plot_hists([
-                        self.ntuple['lead_pion_p'],
-                        self.ntuple['lead_pion_p'][single_track],
-                        self.ntuple['lead_pion_p'][hcal_veto],
-                        self.ntuple['lead_pion_p'][ecal_veto],
-                        self.ntuple['lead_pion_p'][basic_veto]
-                       ],
-                      np.linspace(0, 4000, 161),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Leading $\pi$ Momentum (MeV)')
-
-        plt.create_root_hist('lead_pion_p', 
-                             self.ntuple['lead_pion_p'], 
-                             160, 0, 4000,
-                             'Leading #pi Momentum (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('lead_pion_p - %s' % name, 
-                                 self.ntuple['lead_pion_p'][cut], 
-                                 160, 0, 4000,
-                                 'Leading #pi Momentum (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['max_w'],
-                        self.ntuple['max_w'][single_track],
-                        self.ntuple['max_w'][hcal_veto],
-                        self.ntuple['max_w'][ecal_veto],
-                        self.ntuple['max_w'][basic_veto]
-                       ],
-                      np.linspace(0, 5000, 251),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Max W (MeV)')
-
-        plt.create_root_hist('max_w', 
-                             self.ntuple['max_w'], 
-                             250, 0, 5000,
-                             'Max W (MeV)', 
-                             color=self.colors[0])
-        
-        plt.plot_hists([
-                        self.ntuple['max_w_theta'],
-                        self.ntuple['max_w_theta'][single_track],
-                        self.ntuple['max_w_theta'][hcal_veto],
-                        self.ntuple['max_w_theta'][ecal_veto],
-                        self.ntuple['max_w_theta'][basic_veto]
-                       ],
-                      np.linspace(0, 180, 361),
-                      labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                      ylog=True,
-                      x_label='Max W (MeV)')
-
-        plt.create_root_hist('max_w_theta', 
-                             self.ntuple['max_w_theta'], 
-                             360, 0, 180,
-                             'Max W (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('max_w_theta - %s' % name, 
-                                 self.ntuple['max_w_theta'][cut], 
-                                 360, 0, 180,
-                                 'Max W (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-
-        plt.plot_hists([
-                        self.ntuple['max_w'][self.ntuple['max_w_theta'] > 100]
-                       ],
-                      np.linspace(0, 5000, 251),
-                      labels=['All'],
-                      ylog=True,
-                      x_label='Max W($\theta >$ 100) (MeV)')
-
-        plt.create_root_hist('max_w_theta_cut', 
-                             self.ntuple['max_w'][self.ntuple['max_w_theta'] > 100], 
-                             250, 0, 5000,
-                             'Max W(#theta > 100) (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('max_w_theta_cut - %s' % name, 
-                                 self.ntuple['max_w'][(self.ntuple['max_w_theta'] > 100) & cut], 
-                                 360, 0, 180,
-                                'Max W(#theta > 100) (MeV)', 
-                                 color=self.colors[index])
-
-        plt.plot_hists([
-                        self.ntuple['track_count'],
-                        self.ntuple['track_count'][single_track],
-                        self.ntuple['track_count'][hcal_veto],
-                        self.ntuple['track_count'][ecal_veto],
-                        self.ntuple['track_count'][basic_veto]
-                       ], 
-                       np.linspace(0, 10, 11),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Track Multiplicity')
-
-        plt.create_root_hist('track_count', 
-                             self.ntuple['track_count'], 
-                             10, 0, 10,
-                             'Track Multiplicity', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('track_count - %s' % name, 
-                                 self.ntuple['track_count'][cut], 
-                                 10, 0, 10,
-                                 'Track Multiplicity', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['stub_count'],
-                        self.ntuple['stub_count'][single_track],
-                        self.ntuple['stub_count'][hcal_veto],
-                        self.ntuple['stub_count'][ecal_veto],
-                        self.ntuple['stub_count'][basic_veto]
-                       ],  
-                       np.linspace(0, 10, 11),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Stub Multiplicity')
-
-        plt.create_root_hist('stub_count', 
-                             self.ntuple['stub_count'], 
-                             10, 0, 10,
-                             'Stub Multiplicity', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('stub_count - %s' % name, 
-                                 self.ntuple['stub_count'][cut], 
-                                 10, 0, 10,
-                                 'Stub Multiplicity', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['axial_count'],
-                        self.ntuple['axial_count'][single_track],
-                        self.ntuple['axial_count'][hcal_veto],
-                        self.ntuple['axial_count'][ecal_veto],
-                        self.ntuple['axial_count'][basic_veto]
-                       ],  
-                       np.linspace(0, 10, 11),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Axial Multiplicity')
-
-        plt.create_root_hist('axial_count', 
-                             self.ntuple['axial_count'], 
-                             10, 0, 10,
-                             'Axial Multiplicity', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('axial_count - %s' % name, 
-                                 self.ntuple['axial_count'][cut], 
-                                 10, 0, 10,
-                                 'Axial Multiplicity', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['down_tp_energy'],
-                        self.ntuple['down_tp_energy'][single_track],
-                        self.ntuple['down_tp_energy'][hcal_veto],
-                        self.ntuple['down_tp_energy'][ecal_veto],
-                        self.ntuple['down_tp_energy'][basic_veto]
-                       ], 
-                       np.linspace(0, 100, 201),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True, 
-                       x_label='Energy Deposited in Downstream Trigger Pad (MeV)')
-        
-        plt.create_root_hist('down_tp_energy', 
-                             self.ntuple['down_tp_energy'], 
-                             200, 0, 100,
-                             'Energy Deposited in Downstream Trigger Pad (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('down_tp_energy - %s' % name, 
-                                 self.ntuple['down_tp_energy'][cut], 
-                                 200, 0, 100,
-                                 'Energy Deposited in Downstream Trigger Pad (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-        
-        plt.plot_hists([
-                        self.ntuple['up_tp_energy'],
-                        self.ntuple['up_tp_energy'][single_track],
-                        self.ntuple['up_tp_energy'][hcal_veto],
-                        self.ntuple['up_tp_energy'][ecal_veto],
-                        self.ntuple['up_tp_energy'][basic_veto]
-                       ],
-                       np.linspace(0, 100, 201),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True, 
-                       x_label='Energy Deposited in Upstream Trigger Pad (MeV)')
-        
-        plt.create_root_hist('up_tp_energy', 
-                             self.ntuple['up_tp_energy'], 
-                             200, 0, 100,
-                             'Energy Deposited in Upstream Trigger Pad (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('up_tp_energy - %s' % name, 
-                                 self.ntuple['up_tp_energy'][cut], 
-                                 200, 0, 100,
-                                 'Energy Deposited in Upstream Trigger Pad (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-       
-        plt.plot_hist2d(self.ntuple['up_tp_energy'], 
-                        self.ntuple['down_tp_energy'], 
-                        np.linspace(0, 100, 201),
-                        np.linspace(0, 100, 201),
-                        x_label='Energy Deposited in Upstream Trigger Pad (MeV)', 
-                        y_label='Energy Deposited in Downstream Trigger Pad (MeV)') 
-
-        plt.plot_hists([
-                        self.ntuple['total_ecal_energy'],
-                        self.ntuple['total_ecal_energy'][single_track],
-                        self.ntuple['total_ecal_energy'][hcal_veto],
-                        self.ntuple['total_ecal_energy'][ecal_veto],
-                        self.ntuple['total_ecal_energy'][basic_veto]
-                       ], 
-                       np.linspace(0, 140, 141),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Total Energy Deposited in Ecal Si (MeV)')
-        
-        plt.create_root_hist('total_ecal_energy', 
-                             self.ntuple['total_ecal_energy'], 
-                             140, 0, 140,
-                             'Energy Deposited in Upstream Trigger Pad (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('total_ecal_energy - %s' % name, 
-                                 self.ntuple['total_ecal_energy'][cut], 
-                                 140, 0, 140,
-                                 'Energy Deposited in Upstream Trigger Pad (MeV)',
-                                 color=self.colors[index])
-            index += 1
-        
-        plt.plot_hists([
-                        self.ntuple['ecal_hit_energy'],
-                        self.ntuple['ecal_hit_energy'][single_track],
-                        self.ntuple['ecal_hit_energy'][hcal_veto],
-                        self.ntuple['ecal_hit_energy'][ecal_veto],
-                        self.ntuple['ecal_hit_energy'][basic_veto]
-                       ], 
-                       np.linspace(0, 100, 201),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Readout Hit Energy Deposited in Ecal Si (MeV)')
-        
-        plt.create_root_hist('ecal_hit_energy', 
-                             self.ntuple['ecal_hit_energy'], 
-                             200, 0, 100,
-                             'Readout Hit Energy Deposited in Ecal Si (MeV)',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('ecal_hit_energy - %s' % name, 
-                                 self.ntuple['ecal_hit_energy'][cut], 
-                                 200, 0, 100,
-                                 'Readout Hit Energy Deposited in Ecal Si (MeV)', 
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['hcal_hit_energy'],
-                        self.ntuple['hcal_hit_energy'][single_track],
-                        self.ntuple['hcal_hit_energy'][hcal_veto],
-                        self.ntuple['hcal_hit_energy'][ecal_veto],
-                        self.ntuple['hcal_hit_energy'][basic_veto]
-                       ], 
-                       np.linspace(0, 150, 301),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Readout Hit Energy Deposited in Hcal Scint (MeV)')
-        
-        plt.create_root_hist('hcal_hit_energy', 
-                             self.ntuple['hcal_hit_energy'], 
-                             300, 0, 150,
-                             'Readout Hit Energy Deposited in Ecal Si (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('hcal_hit_energy - %s' % name, 
-                                 self.ntuple['hcal_hit_energy'][cut], 
-                                 300, 0, 150,
-                                 'Readout Hit Energy Deposited in Ecal Si (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        plt.plot_hists([
-                        self.ntuple['total_hcal_energy'],
-                        self.ntuple['total_hcal_energy'][single_track],
-                        self.ntuple['total_hcal_energy'][hcal_veto],
-                        self.ntuple['total_hcal_energy'][ecal_veto],
-                        self.ntuple['total_hcal_energy'][basic_veto]
-                       ],
-                       np.linspace(0, 400, 401),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Total Energy Deposited in Hcal Scint (MeV)')
-
-        plt.create_root_hist('total_hcal_energy', 
-                             self.ntuple['total_hcal_energy'], 
-                             400, 0, 400,
-                             'Total Energy Deposited in Hcal Scint (MeV)', 
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('total_hcal_energy - %s' % name, 
-                                 self.ntuple['total_hcal_energy'][cut], 
-                                 400, 0, 400,
-                                 'Total Energy Deposited in Hcal Scint (MeV)',
-                                 color=self.colors[index])
-            index += 1
-
-        
-        plt.plot_hists([
-                        self.ntuple['total_recoil_hits'],
-                        self.ntuple['total_recoil_hits'][single_track],
-                        self.ntuple['total_recoil_hits'][hcal_veto],
-                        self.ntuple['total_recoil_hits'][ecal_veto],
-                        self.ntuple['total_recoil_hits'][basic_veto]
-                       ],
-                       np.linspace(0, 150, 151),
-                       labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                       ylog=True,
-                       x_label='Recoil Hit Multiplicity')
-
-        plt.create_root_hist('total_recoil_hits', 
-                             self.ntuple['total_recoil_hits'], 
-                             150, 0, 150,
-                             'Recoil Hit Multiplicity',
-                             color=self.colors[0])
-        index = 1
-        for name, cut in cuts.iteritems():
-            plt.create_root_hist('total_recoil_hits - %s' % name, 
-                                 self.ntuple['total_recoil_hits'][cut], 
-                                 150, 0, 150,
-                                 'Recoil Hit Multiplicity', 
-                                 color=self.colors[index])
-            index += 1
-
+        # Encode the selections passed by each event as a category code with
+        # a bit per veto.  This is only done once and shared by all of the
+        # histograms below.  Hit level variables use the code of the event
+        # the hit belongs to.
+        categories = ((self.ntuple['track_count'] == 1).astype(np.int64)*SINGLE_TRACK
+                      | (self.ntuple['passes_ecal_veto'] == 1).astype(np.int64)*ECAL_VETO
+                      | (self.ntuple['passes_hcal_veto'] == 1).astype(np.int64)*HCAL_VETO)
+        hit_categories = dict((variable, np.repeat(categories, np.diff(offsets)))
+                              for variable, offsets in hit_offsets.iteritems())
+
+        variables = [
+            ('pn_gamma_energy', 160, 0, 4000, '$E(\gamma)$ (MeV)', 'E(#gamma) (MeV)'),
+            ('pn_particle_mult', 120, 0, 120, 'PN Multiplicity', 'PN Multiplicity'),
+            ('pn_interaction_z', 450, -1, 1, 'PN $\gamma$ Interaction Point z (mm)', 'PN #gamma Interaction Point z (mm)'),
+            ('lead_hadron_ke', 160, 0, 4000, 'Leading Hadron Kinetic Energy (MeV)', 'Leading Hadron Kinetic Energy (MeV)'),
+            ('lead_hadron_theta', 360, 0, 180, 'Leading Hadron Theta (degrees)', 'Leading Hadron Theta (degrees)'),
+            ('lead_hadron_p', 160, 0, 4000, 'Leading Hadron Momentum (MeV)', 'Leading Hadron Momentum (MeV)'),
+            ('lead_hadron_pdgid', 160, 0, 4000, 'Leading Hadron PDG ID', 'Leading Hadron PDG ID'),
+            ('lead_proton_ke', 160, 0, 4000, 'Leading $p$ Kinetic Energy (MeV)', 'Leading #p Kinetic Energy (MeV)'),
+            ('lead_proton_theta', 360, 0, 180, 'Leading $p$ Theta (degrees)', 'Leading #p Theta (degrees)'),
+            ('lead_proton_p', 160, 0, 4000, 'Leading $p$ Momentum (MeV)', 'Leading #p Momentum (MeV)'),
+            ('lead_neutron_ke', 160, 0, 4000, 'Leading $n$ Kinetic Energy (MeV)', 'Leading #n Kinetic Energy (MeV)'),
+            ('lead_neutron_theta', 360, 0, 180, 'Leading $n$ Theta (degrees)', 'Leading #n Theta (degrees)'),
+            ('lead_neutron_p', 160, 0, 4000, 'Leading $n$ Momentum (MeV)', 'Leading #n Momentum (MeV)'),
+            ('lead_pion_ke', 160, 0, 4000, 'Leading $\pi$ Kinetic Energy (MeV)', 'Leading #pi Kinetic Energy (MeV)'),
+            ('lead_pion_theta', 360, 0, 180, 'Leading $\pi$ Theta (degrees)', 'Leading #pi Theta (degrees)'),
+            ('lead_pion_p', 160, 0, 4000, 'Leading $\pi$ Momentum (MeV)', 'Leading #pi Momentum (MeV)'),
+            ('max_w', 250, 0, 5000, 'Max W (MeV)', 'Max W (MeV)'),
+            ('max_w_theta', 360, 0, 180, 'Max W Theta (degrees)', 'Max W Theta (degrees)'),
+            ('track_count', 10, 0, 10, 'Track Multiplicity', 'Track Multiplicity'),
+            ('stub_count', 10, 0, 10, 'Stub Multiplicity', 'Stub Multiplicity'),
+            ('axial_count', 10, 0, 10, 'Axial Multiplicity', 'Axial Multiplicity'),
+            ('down_tp_energy', 200, 0, 100, 'Energy Deposited in Downstream Trigger Pad (MeV)', 'Energy Deposited in Downstream Trigger Pad (MeV)'),
+            ('up_tp_energy', 200, 0, 100, 'Energy Deposited in Upstream Trigger Pad (MeV)', 'Energy Deposited in Upstream Trigger Pad (MeV)'),
+            ('total_ecal_energy', 140, 0, 140, 'Total Energy Deposited in Ecal Si (MeV)', 'Total Energy Deposited in Ecal Si (MeV)'),
+            ('ecal_hit_energy', 200, 0, 100, 'Readout Hit Energy Deposited in Ecal Si (MeV)', 'Readout Hit Energy Deposited in Ecal Si (MeV)'),
+            ('hcal_hit_energy', 300, 0, 150, 'Readout Hit Energy Deposited in Hcal Scint (MeV)', 'Readout Hit Energy Deposited in Hcal Scint (MeV)'),
+            ('total_hcal_energy', 400, 0, 400, 'Total Energy Deposited in Hcal Scint (MeV)', 'Total Energy Deposited in Hcal Scint (MeV)'),
+            ('total_recoil_hits', 150, 0, 150, 'Recoil Hit Multiplicity', 'Recoil Hit Multiplicity')
+        ]
         for layer_n in xrange(0, 10): 
-            plt.plot_hists([
-                self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)],
-                self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)][single_track],
-                self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)][hcal_veto],
-                self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)][ecal_veto],
-                self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)][basic_veto]
-                ],
-                np.linspace(0, 150, 151),
-                labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                ylog=True,
-                x_label='Recoil Hit Layer %s Multiplicity' % (layer_n + 1))
-
-            plt.plot_hists([
-                self.ntuple['total_charge_l%s' % (layer_n + 1)],
-                self.ntuple['total_charge_l%s' % (layer_n + 1)][single_track],
-                self.ntuple['total_charge_l%s' % (layer_n + 1)][hcal_veto],
-                self.ntuple['total_charge_l%s' % (layer_n + 1)][ecal_veto],
-                self.ntuple['total_charge_l%s' % (layer_n + 1)][basic_veto]
-                ],
-                np.linspace(0, 50, 151),
-                labels=['All', 'Single track', 'Hcal veto', 'Ecal veto', 'Basic veto'], 
-                ylog=True,
-                x_label='Total Charge Layer %s' % (layer_n + 1))
-
-            plt.create_root_hist('total_recoil_hits_l%s' % (layer_n + 1), 
-                                 self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)],
-                                 150, 0, 150,
-                                 'Recoil Hit Layer %s Multiplicity' % (layer_n + 1), 
-                                 color=self.colors[0])
-            plt.create_root_hist('total_charge_l%s' % (layer_n + 1), 
-                                 self.ntuple['total_charge_l%s' % (layer_n + 1)],
-                                 150, 0, 50,
-                                 'Total Charge Layer %s' % (layer_n + 1),
-                                 color=self.colors[0])
-            index = 0
-            for name, cut in cuts.iteritems():
-                plt.create_root_hist('total_recoil_hits_l%s - %s' % ((layer_n + 1), name),
-                                     self.ntuple['total_recoil_hits_l%s' % (layer_n + 1)][cut],
-                                     150, 0, 150,
-                                     'Recoil Hit Layer %s Multiplicity' % (layer_n + 1), 
-                                     color=self.colors[index])
-                plt.create_root_hist('total_charge_l%s - %s' % ((layer_n + 1), name),
-                                     self.ntuple['total_charge_l%s' % (layer_n + 1)][cut],
-                                     150, 0, 50,
-                                     'Total Charge Layer %s' % (layer_n + 1),
-                                     color=self.colors[index])
-                index += 1
+            variables.extend([
+                ('total_recoil_hits_l%s' % (layer_n + 1), 150, 0, 150, 
+                    'Recoil Hit Layer %s Multiplicity' % (layer_n + 1), 
+                    'Recoil Hit Layer %s Multiplicity' % (layer_n + 1)),
+                ('total_charge_l%s' % (layer_n + 1), 150, 0, 50, 
+                    'Total Charge Layer %s' % (layer_n + 1), 
+                    'Total Charge Layer %s' % (layer_n + 1))
+            ])
+
+        for name, bins, x_min, x_max, x_label, root_label in variables: 
+            
+            params = {}
+            if name == 'pn_gamma_energy': params['label_loc'] = 2
+
+            if name == 'pn_interaction_z': 
+                self.plot_selections(plt, name, self.ntuple[name], categories, 
+                                     450, -100, 350, x_label, root_label, 
+                                     root=False)
+
+            self.plot_selections(plt, name, self.ntuple[name], 
+                                 hit_categories.get(name, categories),
+                                 bins, x_min, x_max, x_label, root_label, 
+                                 **params)
+
+            if name.endswith('_theta') and name.startswith('lead_'):
+                ptype = name[:-len('_theta')]
+                plt.plot_hist2d(self.ntuple['%s_ke' % ptype], 
+                                self.ntuple[name], 
+                                np.linspace(0, 4000, 161),
+                                np.linspace(0, 180, 361),
+                                x_label=x_label.replace('Theta (degrees)', 'Kinetic Energy (MeV)'),
+                                y_label=x_label)
+
+            if name == 'max_w_theta': 
+                theta_cut = self.ntuple['max_w_theta'] > 100
+                self.plot_selections(plt, 'max_w_theta_cut', 
+                                     self.ntuple['max_w'][theta_cut], 
+                                     categories[theta_cut], 250, 0, 5000, 
+                                     'Max W($\\theta >$ 100) (MeV)', 
+                                     'Max W(#theta > 100) (MeV)')
+
+            if name == 'up_tp_energy':
+                plt.plot_hist2d(self.ntuple['up_tp_energy'], 
+                                self.ntuple['down_tp_energy'], 
+                                np.linspace(0, 100, 201),
+                                np.linspace(0, 100, 201),
+                                x_label='Energy Deposited in Upstream Trigger Pad (MeV)', 
+                                y_label='Energy Deposited in Downstream Trigger Pad (MeV)')
 
         plt.close()
        
@@ -1,150 +1,112 @@
 
-import AnalysisUtils as au
-import ROOT as r
+import numpy as np
 
-from numpy import linalg as la
-from rootpy.tree import Tree
+from NtupleWriter import NtupleWriter
 
+import AnalysisUtils as au
+import Kinematics as kin
 from EventModels import TrackerEvent
 
-class TrackerAnalysis(object): 
+# Number of layers in the recoil and tagger trackers
+RECOIL_LAYERS = 10
+TAGGER_LAYERS = 14
 
-    def __init__(self): 
+class TrackerAnalysis(object):
+
+    def __init__(self):
         self.tree = None
 
-    def initialize(self, params): 
-        self.tree = Tree('tracker_ntuple', model=TrackerEvent)
-
-    def process(self, event): 
-
-        # Get the collection of MC particles from the event.
-        particles = event.get_collection('SimParticles_sim')
-
-        primary = [p for p in particles if p.getGenStatus() == 1][0]
-
-        pvec = primary.getMomentum()
-        vec = r.TVector3(pvec[0], pvec[1], pvec[2])
-        
-        self.tree.primary_pdg_id = primary.getPdgID()
-        self.tree.primary_p = vec.Mag()
-        self.tree.primary_theta = vec.Theta()
-        self.tree.primary_phi = vec.Phi()
-
-        # Get recoil tracker hits from the event.
-        recoil_hits = event.get_collection('RecoilSimHits_sim')
-        self.tree.recoil_hits_count = recoil_hits.GetEntriesFast()
-
-        for hit in recoil_hits: 
-            self.tree.rhit_x.push_back(hit.getPosition()[0])
-            self.tree.rhit_y.push_back(hit.getPosition()[1])
-            self.tree.rhit_z.push_back(hit.getPosition()[2])
-            #self.tree.rhit_pdg_id.push_back(hit.getPdgID())
-            #self.tree.rhit_trk_id.push_back(hit.getTrackID())
-
-        # Get the FindableTracks collection from the event
-        if event.collection_exist('FindableTracks_recon'):
-            findable_tracks = event.get_collection('FindableTracks_recon')
-            findable_dic, loose_dic, axial_dic = au.get_findable_tracks_map(findable_tracks)
-        
-            self.tree.recoil_track_count        = len(findable_dic)
-            self.tree.recoil_loose_track_count  = len(loose_dic)
-            self.tree.recoil_axial_track_count  = len(axial_dic)
-
-            fparticles = findable_dic.keys()
-            for particle in fparticles: 
-           
-                if particle == primary: self.tree.primary_findable = 1
-
-                self.tree.rfindable_trk_pdg_id.push_back(particle.getPdgID())
-                #self.tree.rfindable_trk_id.push_back(particle.getTrackID())
-            
-                pvec = particle.getMomentum()
-                vec = r.TVector3(pvec[0], pvec[1], pvec[2])
-                
-                self.tree.rfindable_trk_p.push_back(vec.Mag())
-                self.tree.rfindable_trk_theta.push_back(vec.Theta())
-                self.tree.rfindable_trk_phi.push_back(vec.Phi())
-
-        #
-        # Hit Level
-        #
-        '''
-         
-        hit_counter = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        charge_counter = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        l10_hit_counter = 0
-
-        for recoil_hit in recoil_hits:
-            #recoil_hit.Print()
-            hit_counter[recoil_hit.getLayerID() - 1] += 1
-            charge_counter[recoil_hit.getLayerID() - 1] += recoil_hit.getEdep()
-            
-            if recoil_hit.getLayerID() == 10: 
-                if recoil_hit.getSimParticle() in findable_particles: continue
-                l10_hit_counter += 1
-        
-        self.tree.recoil_hits_count_l10_no_track = l10_hit_counter
-
-        for layer_n in xrange(0, len(hit_counter)):
-            setattr(self.tree, 'recoil_hits_count_l%s' % (layer_n + 1), hit_counter[layer_n])
-            setattr(self.tree, 'recoil_charge_total_l%s' % (layer_n + 1), charge_counter[layer_n])
-
-        tagger_hits = event.get_collection('TaggerSimHits_sim')
-        self.tree.tagger_hits_count = tagger_hits.GetEntriesFast()
-         
-        hit_counter    = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        charge_counter = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-
-        for tagger_hit in tagger_hits:
-            hit_counter[tagger_hit.getLayerID() - 1] += 1
-            charge_counter[tagger_hit.getLayerID() - 1] += tagger_hit.getEdep()
-       
-        for layer_n in xrange(0, len(hit_counter)):
-            setattr(self.tree, 'tagger_hits_count_l%s' % (layer_n + 1), hit_counter[layer_n])
-            setattr(self.tree, 'tagger_charge_total_l%s' % (layer_n + 1), charge_counter[layer_n])
-        '''
-        '''
-        target_sp_hits = event.get_collection('TargetScoringPlaneHits_sim')
-
-        self.tree.single_trk_p = -9999
-        self.tree.single_trk_pdg = -9999
-        if len(findable_dic) == 1:
-            #print '[ TargetPhotoNuclearAnalysis ]: Only have a single findable track.'
-            findable_track = findable_dic.itervalues().next()
-            sim_particle = findable_track.getSimParticle()
-            self.tree.single_trk_pdg = findable_track.getSimParticle().getPdgID()
-            p_find = la.norm(sim_particle.getMomentum())
-            #print '[ TargetPhotoNuclearAnalysis ]: p of findable track: %s' % p_find
-            is_recoil = False
-            if recoil_e == sim_particle: is_recoil = True
-            #if is_recoil: print '[ TargetPhotoNuclearAnalysis ]: Findable track is recoil e.'
-            #print 'Sim particle:'
-            #sim_particle.Print()
-            min = 10000
-            for target_sp_hit in target_sp_hits: 
-                if target_sp_hit.getSimParticle() == sim_particle: 
-                    #print '[ TargetPhotoNuclearAnalysis ]: Iterating over target sp sim particle.'
-                    #target_sp_hit.getSimParticle().Print()
-                    pvec = target_sp_hit.getMomentum()
-                    if pvec[2] < 0: 
-                        #print '[ TargetPhotoNuclearAnalysis ]: particle is going backwards, pz = %s' % pvec[2] 
-                        continue
-                    p = la.norm(pvec)
-                    #print '[ TargetPhotoNuclearAnalysis ]: Momentum at scoring plane: %s' % p
-                    if is_recoil: 
-                        #print '[ TargetPhotoNuclearAnalysis ]: Momentum of gamma: %s' % self.tree.pn_gamma_energy
-                        diff = p_find - (pn_gamma.getEnergy() + p)
-                        #print '[ TargetPhotoNuclearAnalysis ]: Difference: %s' % diff
-                    else: 
-                        diff = p_find - p
-                    
-                    if diff < min: 
-                        #print '[ TargetPhotoNuclearAnalysis ]: Found best match'
-                        self.tree.single_trk_p = p
-                        min = diff
-        '''
-        self.tree.fill(reset=True)
-    
+    def initialize(self, params):
+        self.tree = NtupleWriter('tracker_ntuple', TrackerEvent)
+
+    def process_batch(self, batch):
+
+        # Get the MC particles from the batch.  The primary is the first
+        # particle of each event with a generator status of 1.
+        status, poffsets = batch.get_jagged('SimParticles_sim', 'genStatus_')
+        pdg_id = batch.get_jagged('SimParticles_sim', 'pdgID_')[0]
+        px = batch.get_jagged('SimParticles_sim', 'px_')[0]
+        py = batch.get_jagged('SimParticles_sim', 'py_')[0]
+        pz = batch.get_jagged('SimParticles_sim', 'pz_')[0]
+
+        p = kin.momentum(px, py, pz)
+        theta = kin.theta(px, py, pz)
+        phi = kin.phi(px, py)
+
+        primary = au.segment_first(status == 1, poffsets)
+        has_primary = primary >= 0
+
+        # Get recoil tracker hits from the batch.
+        layer, offsets = batch.get_jagged('RecoilSimHits_sim', 'layerID_')
+        edep = batch.get_jagged('RecoilSimHits_sim', 'edep_')[0]
+        x = batch.get_jagged('RecoilSimHits_sim', 'x_')[0]
+        y = batch.get_jagged('RecoilSimHits_sim', 'y_')[0]
+        z = batch.get_jagged('RecoilSimHits_sim', 'z_')[0]
+
+        recoil_hits = au.sum_per_layer(layer, offsets, RECOIL_LAYERS)
+        recoil_charge = au.sum_per_layer(layer, offsets, RECOIL_LAYERS, edep)
+
+        # Get tagger tracker hits from the batch.
+        tlayer, toffsets = batch.get_jagged('TaggerSimHits_sim', 'layerID_')
+        tedep = batch.get_jagged('TaggerSimHits_sim', 'edep_')[0]
+
+        tagger_hits = au.sum_per_layer(tlayer, toffsets, TAGGER_LAYERS)
+        tagger_charge = au.sum_per_layer(tlayer, toffsets, TAGGER_LAYERS, tedep)
+
+        # Get the FindableTracks collection from the batch and classify the
+        # tracks of every event.
+        has_findable = batch.collection_exist('FindableTracks_recon')
+        if has_findable:
+            findable = au.count_findable_tracks(batch, au.FINDABLE_DEFINITIONS)
+            track_particles, track_count = findable['track']
+            loose_count = findable['loose'][1]
+            axial_count = findable['axial'][1]
+            tracks = np.searchsorted(track_particles, poffsets)
+
+            is_findable = np.zeros(len(status), dtype=bool)
+            is_findable[track_particles] = True
+
+            # Count the hits in the last layer that weren't created by a
+            # particle with a findable track
+            hit_particle = batch.get_ref_index('RecoilSimHits_sim',
+                    'simParticle_', 'SimParticles_sim')
+            no_track = (layer == RECOIL_LAYERS) & np.logical_not(
+                    (hit_particle >= 0) & is_findable[np.maximum(hit_particle, 0)])
+            l10_no_track = au.segment_sum(no_track.astype(np.float64), offsets)
+
+        columns = {
+            'primary_pdg_id' : au.take(pdg_id, primary, -9999),
+            'primary_p' : au.take(p, primary, -9999),
+            'primary_theta' : au.take(theta, primary, -9999),
+            'primary_phi' : au.take(phi, primary, -9999),
+            'recoil_hits_count' : np.diff(offsets),
+            'rhit_x' : (x, offsets),
+            'rhit_y' : (y, offsets),
+            'rhit_z' : (z, offsets),
+            'tagger_hits_count' : np.diff(toffsets)
+        }
+        for layer_n in xrange(0, RECOIL_LAYERS):
+            columns['recoil_hits_count_l%s' % (layer_n + 1)] = recoil_hits[:, layer_n]
+            columns['recoil_charge_total_l%s' % (layer_n + 1)] = recoil_charge[:, layer_n]
+        for layer_n in xrange(0, TAGGER_LAYERS):
+            columns['tagger_hits_count_l%s' % (layer_n + 1)] = tagger_hits[:, layer_n]
+            columns['tagger_charge_total_l%s' % (layer_n + 1)] = tagger_charge[:, layer_n]
+
+        if has_findable:
+            columns.update({
+                'recoil_track_count' : track_count,
+                'recoil_loose_track_count' : loose_count,
+                'recoil_axial_track_count' : axial_count,
+                'recoil_hits_count_l10_no_track' : l10_no_track,
+                'primary_findable' : has_primary & is_findable[np.maximum(primary, 0)],
+                'rfindable_trk_pdg_id' : (pdg_id[track_particles], tracks),
+                'rfindable_trk_p' : (p[track_particles], tracks),
+                'rfindable_trk_theta' : (theta[track_particles], tracks),
+                'rfindable_trk_phi' : (phi[track_particles], tracks)
+            })
+
+        self.tree.fill_batch(batch.n_events, columns)
+
     def finalize(self):
 
         self.tree.write()
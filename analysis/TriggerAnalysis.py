@@ -1,22 +1,56 @@
 
-from rootpy.tree import Tree
+import numpy as np
 
+from NtupleWriter import NtupleWriter
+
+import AnalysisUtils as au
 from EventModels import TriggerEvent
 
-class TriggerAnalysis(object): 
+class TriggerAnalysis(object):
 
-    def __init__(self): 
+    def __init__(self):
         self.tree = None
 
-    def initialize(self, params): 
-        self.tree = Tree('trigger_ntuple', model=TriggerEvent)
+    def initialize(self, params):
+        self.tree = NtupleWriter('trigger_ntuple', TriggerEvent)
+
+        # Thresholds and layer ranges the trigger is emulated with when the
+        # trigger result isn't available.  Every combination is evaluated and
+        # the first one is used as the trigger decision persisted to the tree.
+        self.thresholds = params.get('trigger_thresholds', [au.TRIGGER_THRESHOLD])
+        self.layer_ranges = params.get('trigger_layers', [au.TRIGGER_LAYERS])
+
+        # The emulated trigger of the batch the current event belongs to
+        self.batch = None
+        self.layer_sums = None
+        self.passed = None
+
+        # Number of events passing each combination of layer range and
+        # threshold
+        self.event_count = 0
+        self.pass_count = np.zeros((len(self.layer_ranges), len(self.thresholds)),
+                                   dtype=np.int64)
+
+    def emulate(self, event):
+
+        # The trigger is emulated for the whole batch the first time one of
+        # its events is processed
+        batch = event.get_batch()
+        if batch is not self.batch:
+            self.batch = batch
+            self.layer_sums, self.passed = au.emulate_trigger(
+                    batch, self.layer_ranges, self.thresholds)
+            self.event_count += batch.n_events
+            self.pass_count += self.passed.sum(axis=0)
 
-    def process(self, event): 
+        return event.get_batch_entry()
+
+    def process(self, event):
 
         # Check if the trigger collection exist. If it does, use it to get the
         # trigger result. Otherwise, calculate the trigger result.
-        if event.collection_exist('Trigger_recon'): 
-            
+        if event.collection_exist('Trigger_recon'):
+
             # Get the collection of trigger results from the collection
             trigger_results = event.get_collection('Trigger_recon')
 
@@ -27,11 +61,25 @@ class TriggerAnalysis(object):
             # Get the ECal energy sum used by the trigger decision
             self.tree.layer_sum = trigger_results[0].getAlgoVar(0)
 
+        else:
+
+            ientry = self.emulate(event)
+            self.tree.triggered = int(self.passed[ientry, 0, 0])
+            self.tree.layer_sum = self.layer_sums[ientry, 0]
+
         # Fill the tree
         self.tree.fill(reset=True)
 
-    def finalize(self): 
-      
+    def finalize(self):
+
         # Write the tree to the file
         self.tree.write()
 
+        if not self.event_count: return
+
+        print '[ TriggerAnalysis ]: Emulated trigger pass fractions (%s events)' % self.event_count
+        for irange, (start, end) in enumerate(self.layer_ranges):
+            for ithreshold, threshold in enumerate(self.thresholds):
+                print '[ TriggerAnalysis ]: Layers %s-%s < %s MeV: %.4f' % (
+                        start, end, threshold,
+                        self.pass_count[irange, ithreshold]/float(self.event_count))
@@ -3,6 +3,8 @@
 import argparse
 import importlib
 import Event as e
+import NtupleWriter as nw
+import Plotter
 import ROOT as r
 import os
 import sys
@@ -26,6 +28,8 @@ def main() :
                         help="Total number of events.")
     parser.add_argument('-p', action='store', dest='n_print', 
                          help='Freqency of event number printing.')
+    parser.add_argument('--headless', action='store_true', dest='headless', 
+                         help='Only write ROOT histograms and save the plots for later rendering.')
     args = parser.parse_args()
 
     if not args.config :
@@ -61,7 +65,26 @@ def main() :
         ofile_path = config['OutputFile'][0]
 
     ofile = root_open(ofile_path, 'recreate')
+
+    # The ntuples are written to the output file as trees by default.  They
+    # can instead be written as Parquet or Arrow IPC files next to it.
+    output_format = 'root'
+    if 'OutputFormat' in config: 
+        output_format = config['OutputFormat'][0]
+
+    # Compression and layout settings of each ntuple
+    output_settings = {}
+    if 'OutputSettings' in config: 
+        output_settings = config['OutputSettings']
+    nw.configure(output_format, ofile_path, output_settings)
     
+    # In headless mode, plots aren't rendered.  They are instead saved as
+    # binned data that can be rendered using render_plots.py.
+    headless = args.headless
+    if 'Headless' in config: 
+        headless = headless or bool(config['Headless'][0])
+    Plotter.configure(headless)
+
     params = {}
     if 'Parameters' in config: 
         params = config['Parameters']
@@ -73,24 +96,51 @@ def main() :
     if 'TreeName' in config: 
         tree_name = config['TreeName'][0]
 
+    # Analyses that implement process_batch are handed batches of events in
+    # columnar form.  All others are processed one event at a time.
+    batch_analyses = [analysis for analysis in analyses_instances 
+                      if hasattr(analysis, 'process_batch')]
+    event_analyses = [analysis for analysis in analyses_instances 
+                      if not hasattr(analysis, 'process_batch')]
+
+    batch_size = 10000
+    if 'BatchSize' in config: 
+        batch_size = int(config['BatchSize'][0])
+
     event = e.Event(config)
     # Loop through all of the ROOT files and process them.
     for rfile_path in files :
         print 'Processing file %s' % rfile_path
         event.load_file(rfile_path, tree_name)
-        
+       
+        entry_stop = event.get_entries()
+        if int(n_events) > 0: 
+            entry_stop = min(entry_stop, int(n_events))
+
         event_counter = 0
-        while event.next_event():
-            for analysis in analyses_instances:
-                analysis.process(event)
-            event_counter += 1
+        for batch in event.get_batches(batch_size, entry_stop):
             
-            if event_counter == int(n_events): 
-                print 'Hit event limit'
-                break
+            for analysis in batch_analyses: 
+                analysis.process_batch(batch)
+
+            # Without event analyses, progress is reported whenever a batch
+            # crosses a multiple of n_print
+            if not event_analyses: 
+                if batch.entry_stop//n_print > event_counter//n_print: 
+                    print '[ ldmxpy ]: >> Event >> %s >>' % batch.entry_stop
+                event_counter = batch.entry_stop
+                continue
+
+            while (event_counter < batch.entry_stop) and event.next_event():
+                for analysis in event_analyses:
+                    analysis.process(event)
+                event_counter += 1
+            
+                if event_counter%n_print == 0: 
+                    print '[ ldmxpy ]: >> Event >> %s >>' % event_counter
 
-            if event_counter%n_print == 0: 
-                print '[ ldmxpy ]: >> Event >> %s >>' % event_counter
+        if (int(n_events) > 0) and (event_counter == int(n_events)): 
+            print 'Hit event limit'
 
         print "Total number of events processed: %s" % event_counter
         event.close_file()
@@ -100,5 +150,9 @@ def main() :
         
     ofile.close()
 
+    # Report the write time, size and read back throughput of the ntuples
+    if 'OutputReport' in config and config['OutputReport'][0]: 
+        nw.report()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+
+import numpy as np
+
+class Column(object):
+
+    def __init__(self, dtype=np.float64, capacity=1024, shape=()):
+
+        # Values are stored in a typed buffer that is grown geometrically so
+        # appending is amortized O(1).  Only the first size entries are valid.
+        # Each entry can itself be an array of the given shape e.g. the value
+        # of a quantity for a grid of parameters.
+        self.data = np.empty((capacity,) + tuple(shape), dtype=dtype)
+        self.size = 0
+
+    def reserve(self, capacity):
+
+        if capacity <= len(self.data): return
+
+        data = np.empty((max(capacity, 2*len(self.data)),) + self.data.shape[1:], 
+                        dtype=self.data.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def append(self, value):
+
+        if self.size == len(self.data): self.reserve(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+
+        values = np.asarray(values)
+        self.reserve(self.size + len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def view(self):
+
+        # View of the valid entries.  No copy of the buffer is made.
+        return self.data[:self.size]
+
+    def clear(self):
+
+        # Drop all entries while keeping the buffer so it can be refilled
+        # without reallocating
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+class JaggedColumn(Column):
+
+    def __init__(self, dtype=np.float64, capacity=1024, shape=()):
+        Column.__init__(self, dtype, capacity, shape)
+
+        # Offsets delimiting the values of each event i.e. the values of
+        # event i are given by view()[offsets[i]:offsets[i + 1]]
+        self.offsets = Column(np.int64)
+        self.offsets.append(0)
+
+    def end_event(self):
+        self.offsets.append(self.size)
+
+    def clear(self):
+        Column.clear(self)
+        self.offsets.clear()
+        self.offsets.append(0)
+
+class ColumnAccumulator(object):
+
+    def __init__(self):
+
+        self.columns = {}
+        self.jagged_columns = []
+
+    def add_column(self, name, dtype=np.float64, jagged=False, shape=()):
+
+        # Event level columns hold a single value per event while jagged
+        # columns hold any number of values (e.g. one per hit) per event.
+        if jagged:
+            column = JaggedColumn(dtype, shape=shape)
+            self.jagged_columns.append(column)
+        else: column = Column(dtype, shape=shape)
+
+        self.columns[name] = column
+        return column
+
+    def end_event(self):
+
+        # Record the event boundary of all jagged columns.  This needs to be
+        # called once all values of an event have been appended.
+        for column in self.jagged_columns:
+            column.end_event()
+
+    def clear(self):
+        for column in self.columns.itervalues():
+            column.clear()
+
+    def get_offsets(self, name):
+        return self.columns[name].offsets.view()
+
+    def arrays(self):
+
+        # Get zero-copy views of all columns keyed by name
+        return dict((name, column.view())
+                    for name, column in self.columns.iteritems())
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
@@ -1,9 +1,24 @@
 
 import ROOT as r 
+import numpy as np
+
+import Kinematics as kin
+
+from EventBatch import EventBatch
 
 from rootpy.io import root_open
 from rootpy.io import DoesNotExist
 
+def add_derived_kinematics(table):
+
+    # Add the quantities derived from the energy, mass and momentum
+    table['ke'] = kin.kinetic_energy(table['energy'], table['mass'])
+    table['p'] = kin.momentum(table['px'], table['py'], table['pz'])
+    table['pt'] = kin.pt(table['px'], table['py'])
+    table['theta'] = kin.theta(table['px'], table['py'], table['pz'])
+    table['phi'] = kin.phi(table['px'], table['py'])
+    return table
+
 class Event(object):
 
     def __init__(self, config):
@@ -14,6 +29,19 @@ class Event(object):
         self.rfile = None
         self.tree = None
         self.entry = 0
+
+        # Columnar view of the current file. This is only opened if batches
+        # of events are requested.
+        self.rfile_path = None
+        self.tree_name = None
+        self.columns = None
+        
+        # The batch the current event belongs to
+        self.batch = None
+
+        # Kinematics of the particles of the current event.  This is only 
+        # built when requested.
+        self.kinematics = None
        
         self.event_header = r.ldmx.EventHeader()
 
@@ -36,8 +64,13 @@ class Event(object):
 
         self.entry = 0
 
+        self.rfile_path = rfile_path
+        self.tree_name = tree_name
+        self.columns = None
+
     def close_file(self):
         if self.rfile: self.rfile.Close()
+        self.columns = None
 
     def next_event(self):
         if self.entry >= self.tree.GetEntries(): return False
@@ -46,8 +79,88 @@ class Event(object):
         
         self.tree.GetEntry(self.entry)
         self.entry += 1
+        self.kinematics = None
         return True
 
+    def get_entries(self): 
+        return self.tree.GetEntries()
+
+    def get_columns(self):
+
+        # uproot4 is only needed once the columns of a batch are read
+        if self.columns is None: 
+            import uproot4
+            self.columns = uproot4.open(
+                    '%s:%s' % (self.rfile_path, self.tree_name))
+        return self.columns
+
+    def get_batches(self, batch_size, entry_stop):
+        
+        # Split the entries of the current file into batches.  The columns
+        # of a batch are only read when they are requested so iterating over 
+        # the batches is cheap if no columns are used. 
+        for entry_start in xrange(0, entry_stop, batch_size):
+            self.batch = EventBatch(self, entry_start, 
+                                    min(entry_start + batch_size, entry_stop))
+            yield self.batch
+        self.batch = None
+
+    def get_batch(self): 
+        return self.batch
+
+    def get_batch_entry(self): 
+        
+        # Position of the current event within its batch.  This allows 
+        # analyses processing one event at a time to look up quantities 
+        # computed for the whole batch.
+        return self.entry - 1 - self.batch.entry_start
+
+    def get_kinematics(self): 
+
+        # Table of the SimParticles of the current event holding one array 
+        # per quantity, indexed by the position of the particle in the 
+        # collection.  It's built the first time it's requested so all 
+        # analyses share it.  When the event belongs to a batch, the table 
+        # of the whole batch is built once from its columns and sliced 
+        # instead of calling the getters of every particle.
+        if self.kinematics is not None: return self.kinematics
+
+        if self.batch is not None:
+            table, offsets = self.get_batch_kinematics()
+            ientry = self.get_batch_entry()
+            particles = slice(offsets[ientry], offsets[ientry + 1])
+            self.kinematics = dict((name, values[particles]) 
+                                   for name, values in table.iteritems())
+            return self.kinematics
+
+        names = ['pdg_id', 'energy', 'mass', 'px', 'py', 'pz']
+        particles = self.get_collection('SimParticles_sim')
+        values = [(particle.getPdgID(), particle.getEnergy(), particle.getMass(),
+                   particle.getMomentum()[0], particle.getMomentum()[1], 
+                   particle.getMomentum()[2]) for particle in particles]
+        values = np.array(values, dtype=np.float64).reshape(-1, len(names))
+        table = dict((name, values[:, i]) for i, name in enumerate(names))
+        table['pdg_id'] = table['pdg_id'].astype(np.int64)
+
+        self.kinematics = add_derived_kinematics(table)
+        return self.kinematics
+
+    def get_batch_kinematics(self): 
+
+        # Kinematics table of all SimParticles of the current batch along 
+        # with the offsets delimiting each event.  It's cached with the batch.
+        key = ('kinematics',)
+        if key not in self.batch.cache:
+            members = [('pdg_id', 'pdgID_'), ('energy', 'energy_'), 
+                       ('mass', 'mass_'), ('px', 'px_'), ('py', 'py_'), 
+                       ('pz', 'pz_')]
+            offsets = self.batch.get_offsets('SimParticles_sim', 'pdgID_')
+            table = dict((name, self.batch.get_jagged('SimParticles_sim', member)[0])
+                         for name, member in members)
+            self.batch.cache[key] = (add_derived_kinematics(table), offsets)
+
+        return self.batch.cache[key]
+
     def collection_exist(self, collection_name):
         if collection_name in self.collections: return True
         else: return False
@@ -0,0 +1,168 @@
+
+import numpy as np
+
+from ParticleGraph import ParticleGraph
+
+def get_offsets(arrays): 
+
+    # Build the offsets delimiting each event from an array of per-event 
+    # arrays
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(a) for a in arrays), dtype=np.int64, 
+                          count=len(arrays)), out=offsets[1:])
+    return offsets
+
+class EventBatch(object):
+
+    def __init__(self, event, entry_start, entry_stop):
+
+        # The event the batch was created from. It provides the columnar
+        # view of the file being processed.
+        self.event = event
+
+        self.entry_start = entry_start
+        self.entry_stop = entry_stop
+        self.n_events = entry_stop - entry_start
+
+        # Columns are only read from the file the first time they are
+        # requested.  After that, they are served from the cache.
+        self.cache = {}
+
+    def collection_exist(self, collection_name):
+        return collection_name in self.event.get_columns().keys()
+
+    def read(self, collection_name, member):
+
+        key = (collection_name, member)
+        if key not in self.cache:
+            self.cache[key] = self.event.get_columns()[collection_name][member].array(
+                    library='np',
+                    entry_start=self.entry_start,
+                    entry_stop=self.entry_stop)
+
+        return self.cache[key]
+
+    def get_array(self, collection_name, member):
+
+        # Event level quantities e.g. the event weight stored in the 
+        # EventHeader.  A single value per event is returned.
+        return self.read(collection_name, member)
+
+    def get_jagged(self, collection_name, member):
+       
+        # Hit or particle level quantities.  The values of all events in the 
+        # batch are returned as a single flat array along with the offsets 
+        # delimiting each event i.e. the values of event i are given by 
+        # values[offsets[i]:offsets[i + 1]].
+        key = (collection_name, member, 'jagged')
+        if key not in self.cache:
+            arrays = self.read(collection_name, member)
+            offsets = get_offsets(arrays)
+
+            if len(arrays) == 0: values = np.zeros(0)
+            else: values = np.concatenate(arrays)
+
+            self.cache[key] = (values, offsets)
+
+        return self.cache[key]
+
+    def get_offsets(self, collection_name, member):
+        return self.get_jagged(collection_name, member)[1]
+
+    def get_refs(self, collection_name, member):
+
+        # Get the unique IDs of the objects a TRef member points to.  These
+        # are returned in the same flat layout as get_jagged.
+        key = (collection_name, member, 'refs')
+        if key not in self.cache:
+            arrays = self.read(collection_name, member)
+            offsets = get_offsets(arrays)
+            uids = np.fromiter((ref.ref for refs in arrays for ref in refs), 
+                               dtype=np.int64, count=offsets[-1])
+            self.cache[key] = (uids, offsets)
+        
+        return self.cache[key]
+
+    def get_ref_arrays(self, collection_name, member):
+
+        # Get the unique IDs of the objects a TRefArray member points to e.g.
+        # the daughters of a SimParticle.  The IDs of all objects in the batch
+        # are returned as a flat array along with the offsets delimiting the
+        # references of each object.
+        key = (collection_name, member, 'ref_arrays')
+        if key not in self.cache:
+            arrays = self.read(collection_name, member)
+            ref_arrays = [ref_array for ref_arrays in arrays 
+                          for ref_array in ref_arrays]
+            offsets = get_offsets([ref_array.refs for ref_array in ref_arrays])
+            uids = np.fromiter((ref for ref_array in ref_arrays 
+                                for ref in ref_array.refs), 
+                               dtype=np.int64, count=offsets[-1])
+            self.cache[key] = (uids, offsets)
+
+        return self.cache[key]
+
+    def resolve(self, refs, events, target_name): 
+        
+        # Find the position of the objects with the given unique IDs in the 
+        # flattened target collection.  Unique IDs are only unique within an
+        # event so the event index is folded into the key used for the 
+        # lookup.  References that can't be resolved are set to -1.
+        key = (target_name, 'sorted_keys')
+        if key not in self.cache:
+            uids, target_offsets = self.get_jagged(target_name, 'fUniqueID')
+            target_keys = ((np.repeat(np.arange(self.n_events, dtype=np.int64), 
+                                      np.diff(target_offsets)) << 24) 
+                           | (uids.astype(np.int64) & 0xFFFFFF))
+            order = np.argsort(target_keys, kind='mergesort')
+            self.cache[key] = (target_keys[order], order)
+        target_keys, order = self.cache[key]
+
+        keys = (events.astype(np.int64) << 24) | (refs & 0xFFFFFF)
+        index = np.full(len(keys), -1, dtype=np.int64)
+        if len(target_keys) and len(keys): 
+            pos = np.minimum(np.searchsorted(target_keys, keys), 
+                             len(target_keys) - 1)
+            found = target_keys[pos] == keys
+            index[found] = order[pos[found]]
+
+        return index
+
+    def get_ref_array_index(self, collection_name, member, target_name):
+
+        # Resolve a TRefArray member to the positions of the objects it 
+        # points to within the flattened target collection.  The offsets 
+        # delimiting the references of each object are also returned.
+        key = (collection_name, member, target_name)
+        if key not in self.cache:
+            refs, offsets = self.get_ref_arrays(collection_name, member)
+            owner_offsets = self.get_offsets(collection_name, 'fUniqueID')
+            owner_events = np.repeat(np.arange(self.n_events), 
+                                     np.diff(owner_offsets))
+            events = np.repeat(owner_events, np.diff(offsets))
+            self.cache[key] = (self.resolve(refs, events, target_name), offsets)
+
+        return self.cache[key]
+
+    def get_ref_index(self, collection_name, member, target_name):
+
+        # Resolve a TRef member to the position of the object it points to 
+        # within the flattened target collection e.g. the SimParticle that 
+        # created a hit.  References that can't be resolved are set to -1.
+        key = (collection_name, member, target_name)
+        if key not in self.cache:
+            refs, offsets = self.get_refs(collection_name, member)
+            events = np.repeat(np.arange(self.n_events), np.diff(offsets))
+            self.cache[key] = self.resolve(refs, events, target_name)
+
+        return self.cache[key]
+
+    def get_particle_graph(self):
+
+        # SimParticles of the batch along with their daughter and parent 
+        # indices.  The graph is only built once per batch.
+        key = ('particle_graph',)
+        if key not in self.cache:
+            self.cache[key] = ParticleGraph(self)
+
+        return self.cache[key]
@@ -0,0 +1,79 @@
+import itertools
+
+class Column(object):
+
+    def __init__(self, name, leaf_type, shape=(), default=0, jagged=False):
+
+        # A column of an ntuple.  The leaf type follows the ROOT conventions
+        # i.e. I (int), L (long), F (float) and D (double).  Columns either
+        # hold a single value per event, a fixed size array (shape) or any
+        # number of values (jagged).
+        self.name = name
+        self.leaf_type = leaf_type
+        self.shape = tuple(shape)
+        self.default = default
+        self.jagged = jagged
+
+def expand(names):
+
+    # Flatten a mix of names and lists of names (see numbered)
+    for name in names:
+        if isinstance(name, basestring): yield name
+        else:
+            for n in name: yield n
+
+def numbered(pattern, *values):
+
+    # Generate the names of a family of columns by formatting the pattern with
+    # every combination of the values e.g.
+    #
+    #   numbered('hits_l%s', range(1, 4)) => hits_l1, hits_l2, hits_l3
+    return [pattern % combination for combination in itertools.product(*values)]
+
+def columns(leaf_type, names, shape=(), default=0, jagged=False):
+    return [Column(name, leaf_type, shape, default, jagged) for name in expand(names)]
+
+def Int(*names, **kwargs):
+    return columns('I', names, default=kwargs.get('default', 0))
+
+def Float(*names, **kwargs):
+    return columns('F', names, default=kwargs.get('default', 0))
+
+def Double(*names, **kwargs):
+    return columns('D', names, default=kwargs.get('default', 0))
+
+def FloatArray(size, *names, **kwargs):
+    return columns('F', names, shape=(size,), default=kwargs.get('default', 0))
+
+def Vector(*names, **kwargs):
+
+    # Vectors hold doubles unless an int element type is given
+    leaf_type = 'I' if kwargs.get('element', 'double') == 'int' else 'D'
+    return columns(leaf_type, names, jagged=True)
+
+class Schema(object):
+
+    def __init__(self, *groups):
+
+        # The columns of an ntuple given as groups of columns created using
+        # the functions above e.g.
+        #
+        #   Schema(Int('n_hits'), Float('x', 'y', default=-9999), Vector('hit_e'))
+        #
+        # Schemas can be combined using +.
+        self.columns = [column for group in groups for column in group]
+
+        names = set()
+        for column in self.columns:
+            if column.name in names:
+                raise RuntimeError('Column %s is declared more than once.' % column.name)
+            names.add(column.name)
+
+    def __add__(self, other):
+        return Schema(self.columns, other.columns)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
@@ -0,0 +1,544 @@
+import os
+import time
+import ROOT as r
+import numpy as np
+
+from ColumnAccumulator import Column, ColumnAccumulator
+
+# pyarrow is only needed when the ntuples are written as Parquet or Arrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Number of events buffered before they are written to the tree.  This is
+# also used as the auto flush setting of the tree so each flush results in a
+# single cluster.
+CLUSTER_SIZE = 10000
+
+# Numpy types of the supported ROOT leaf types
+LEAF_TYPES = {
+    'I' : np.int32,
+    'L' : np.int64,
+    'F' : np.float32,
+    'D' : np.float64
+}
+
+# Supported output formats and the extension of the files they are written to
+OUTPUT_FORMATS = {
+    'root' : '.root',
+    'parquet' : '.parquet',
+    'arrow' : '.arrow'
+}
+
+# ROOT compression algorithms and the level used when none is given.  The
+# compression settings of a branch are given by 100*algorithm + level.
+COMPRESSION_ALGORITHMS = {
+    'ZLIB' : 1,
+    'LZ4' : 4,
+    'ZSTD' : 5
+}
+COMPRESSION_LEVELS = {
+    'ZLIB' : 1,
+    'LZ4' : 4,
+    'ZSTD' : 5
+}
+
+# Names of the compression algorithms used by Parquet and Arrow
+ARROW_COMPRESSION = {
+    'ZLIB' : 'gzip',
+    'LZ4' : 'lz4',
+    'ZSTD' : 'zstd'
+}
+
+# Output settings shared by all writers.  These are set by ldmxpy from the
+# configuration before any analysis is initialized.  The layout settings
+# are keyed by ntuple name with the settings under 'default' applying to
+# all ntuples e.g.
+#
+#   OutputSettings:
+#     default: { compression: LZ4, level: 4 }
+#     ecal_ntuple: { compression: ZSTD, level: 7, basket_size: 256000,
+#                    cluster_size: 50000, auto_flush: 50000 }
+OUTPUT = {
+    'format' : 'root',
+    'path' : 'analysis.root',
+    'settings' : {}
+}
+
+# All writers created so far so their output can be reported on
+WRITERS = []
+
+def configure(output_format='root', path='analysis.root', settings=None):
+
+    if output_format not in OUTPUT_FORMATS:
+        raise RuntimeError('Output format %s is not supported.' % output_format)
+
+    if output_format != 'root' and pa is None:
+        raise RuntimeError('pyarrow is required to write %s output.' % output_format)
+
+    settings = settings or {}
+    for name, tree_settings in settings.iteritems():
+        compression = tree_settings.get('compression')
+        if compression is not None and compression not in COMPRESSION_ALGORITHMS:
+            raise RuntimeError('Compression algorithm %s of %s is not supported.'
+                               % (compression, name))
+
+    OUTPUT['format'] = output_format
+    OUTPUT['path'] = path
+    OUTPUT['settings'] = settings
+
+def get_settings(name):
+
+    # Settings of an ntuple with the defaults filled in
+    settings = dict(OUTPUT['settings'].get('default', {}))
+    settings.update(OUTPUT['settings'].get(name, {}))
+    settings.setdefault('cluster_size', CLUSTER_SIZE)
+    settings.setdefault('auto_flush', settings['cluster_size'])
+    if 'compression' in settings:
+        settings.setdefault('level', COMPRESSION_LEVELS[settings['compression']])
+
+    return settings
+
+def read_back(writer):
+
+    # Read all columns of an ntuple that was written out the way they are
+    # read downstream and return the time it took
+    start = time.time()
+    if OUTPUT['format'] == 'root':
+        import uproot4
+        with uproot4.open(writer.output.path) as ifile:
+            ifile[writer.name].arrays(library='np')
+    elif OUTPUT['format'] == 'parquet': pq.read_table(writer.output.path)
+    else: pa.ipc.open_file(writer.output.path).read_all()
+
+    return time.time() - start
+
+def report():
+
+    # Summarize the cost of writing and reading back each ntuple with the
+    # settings it was written with.  This needs to be called once the
+    # output files are closed.
+    print '[ NtupleWriter ]: Output report (%s)' % OUTPUT['format']
+    for writer in WRITERS:
+        settings = ', '.join('%s=%s' % item for item in sorted(writer.settings.iteritems()))
+        read_time = read_back(writer)
+        size = writer.output.size/1.e6
+        print '[ NtupleWriter ]: %s: %s' % (writer.name, settings)
+        print ('[ NtupleWriter ]:    %s events, write %.3f s, size %.3f MB, '
+               'read %.3f s (%.1f MB/s, %.0f events/s)') % (
+                writer.n_entries, writer.write_time, size, read_time,
+                size/max(read_time, 1e-9), writer.n_entries/max(read_time, 1e-9))
+
+def copy_to_vector(vector, values):
+
+    # Copy an array into a std::vector with a single copy instead of pushing
+    # back the values one at a time.  The array needs to have the type of
+    # the vector elements.
+    vector.resize(len(values))
+    if len(values) == 0: return
+
+    buf = vector.data()
+    buf.SetSize(len(values))
+    np.frombuffer(buf, dtype=values.dtype, count=len(values))[:] = values
+
+class VectorBuffer(object):
+
+    # Stand-in for the std::vector of a jagged column.  The values of the
+    # current event are collected here and only copied to the tree when the
+    # buffered events are written.  The same buffer is reused every event
+    # so clearing it doesn't reallocate.
+    def __init__(self, dtype):
+        self.column = Column(dtype, capacity=16)
+
+    def push_back(self, value):
+        self.column.append(value)
+
+    def assign(self, values):
+        self.column.clear()
+        self.column.extend(values)
+
+    def clear(self):
+        self.column.clear()
+
+    def view(self):
+        return self.column.view()
+
+    def size(self):
+        return self.column.size
+
+    def __len__(self):
+        return self.column.size
+
+class RootOutput(object):
+
+    # Writes the buffered events to a tree in the current directory i.e.
+    # the output file opened by ldmxpy.  Branches are only created for the
+    # columns that were populated.
+    def __init__(self, name, settings):
+
+        self.settings = settings
+        self.tree = r.TTree(name, name)
+        self.tree.SetAutoFlush(settings['auto_flush'])
+        self.path = OUTPUT['path']
+        self.size = 0
+        self.row = None
+        self.fields = []
+        self.vectors = {}
+        self.vector_sizes = {}
+        self.fixed_schema = False
+
+    def book(self, writer, names):
+
+        # Create the branches.  The flat columns are backed by a single
+        # record so the values of an event are set with a single copy.  The
+        # fields are aligned as ROOT expects the address of each branch to
+        # be aligned for its type.
+        self.fields += [(name, writer.specs[name][1], writer.specs[name][2])
+                        for name in names if not writer.specs[name][4]]
+        self.row = np.zeros(1, dtype=np.dtype(self.fields, align=True))
+
+        # Branches that were already created need to point to the new record
+        for name in self.row.dtype.names:
+            if name not in names: self.tree.SetBranchAddress(name, self.row[name])
+
+        branches = []
+        for name in names:
+            leaf_type, dtype, shape, default, jagged = writer.specs[name]
+            if jagged:
+                element = 'int' if leaf_type == 'I' else 'double'
+                self.vectors[name] = r.std.vector(element)()
+                self.vector_sizes[name] = 0
+                branch = self.tree.Branch(name, self.vectors[name])
+            elif shape:
+                branch = self.tree.Branch(name, self.row[name],
+                                          '%s[%s]/%s' % (name, shape[0], leaf_type))
+            else:
+                branch = self.tree.Branch(name, self.row[name], '%s/%s' % (name, leaf_type))
+            branches.append(branch)
+
+            # Without explicit settings, the branches use the compression of
+            # the output file
+            if 'compression' in self.settings:
+                branch.SetCompressionSettings(
+                        100*COMPRESSION_ALGORITHMS[self.settings['compression']]
+                        + self.settings['level'])
+
+            if 'basket_size' in self.settings:
+                branch.SetBasketSize(self.settings['basket_size'])
+
+        # Columns that were first populated after events were written are
+        # back filled with their default
+        if not self.tree.GetEntries(): return
+        for name, branch in zip(names, branches):
+            leaf_type, dtype, shape, default, jagged = writer.specs[name]
+            if not jagged: self.row[name] = default
+            for entry in xrange(self.tree.GetEntries()): branch.Fill()
+
+    def write(self, writer, names):
+
+        records = np.empty(writer.n_buffered, dtype=self.row.dtype)
+        for name in self.row.dtype.names:
+            records[name] = writer.get_values(name)[0]
+
+        vectors = [(name, self.vectors[name]) + writer.get_values(name)
+                   for name in names if writer.specs[name][4]]
+
+        # Trees are still filled one entry at a time.  Vectors that were
+        # empty in the previous entry and are empty again aren't touched.
+        for entry in xrange(writer.n_buffered):
+            self.row[0] = records[entry]
+            for name, vector, values, offsets in vectors:
+                start, stop = offsets[entry], offsets[entry + 1]
+                if (start == stop) and not self.vector_sizes[name]: continue
+                copy_to_vector(vector, values[start:stop])
+                self.vector_sizes[name] = stop - start
+            self.tree.Fill()
+
+    def close(self):
+
+        self.tree.GetDirectory().cd()
+        self.tree.Write()
+        self.size = self.tree.GetZipBytes()
+
+class ArrowOutput(object):
+
+    # Writes the buffered events to a Parquet or Arrow IPC file named after
+    # the output file and the ntuple e.g. analysis_ecal_ntuple.parquet.
+    # Array and jagged columns are written as list columns and each flush
+    # results in a single row group (Parquet) or record batch (Arrow).  The
+    # schema of the files can't change once written so all columns of the
+    # ntuple are written.
+    def __init__(self, name, output_format, settings):
+
+        self.format = output_format
+        self.settings = settings
+        self.path = '%s_%s%s' % (os.path.splitext(OUTPUT['path'])[0], name,
+                                 OUTPUT_FORMATS[output_format])
+        self.size = 0
+        self.schema = None
+        self.file = None
+        self.fixed_schema = True
+
+    def book(self, writer, names):
+
+        fields = []
+        for name in names:
+            leaf_type, dtype, shape, default, jagged = writer.specs[name]
+            field_type = pa.from_numpy_dtype(np.dtype(dtype))
+            if jagged or shape: field_type = pa.list_(field_type)
+            fields.append(pa.field(name, field_type))
+        self.schema = pa.schema(fields)
+
+        compression = ARROW_COMPRESSION.get(self.settings.get('compression'))
+        if self.format == 'parquet':
+            self.file = pq.ParquetWriter(self.path, self.schema,
+                                         compression=compression or 'snappy',
+                                         compression_level=self.settings.get('level'))
+        elif compression is None:
+            self.file = pa.ipc.new_file(self.path, self.schema)
+        else:
+            if compression == 'gzip':
+                raise RuntimeError('Arrow IPC files only support LZ4 and ZSTD compression.')
+            options = pa.ipc.IpcWriteOptions(
+                    compression=pa.Codec(compression, self.settings['level']))
+            self.file = pa.ipc.new_file(self.path, self.schema, options=options)
+
+    def write(self, writer, names):
+
+        arrays = []
+        for name in names:
+            leaf_type, dtype, shape, default, jagged = writer.specs[name]
+            values, offsets = writer.get_values(name)
+            if shape:
+                offsets = np.arange(0, values.size + 1, shape[0])
+                values = values.reshape(-1)
+            elif not jagged:
+                arrays.append(pa.array(values))
+                continue
+            arrays.append(pa.ListArray.from_arrays(
+                pa.array(offsets.astype(np.int32)), pa.array(values)))
+
+        batch = pa.RecordBatch.from_arrays(arrays, self.schema.names)
+        if self.format == 'parquet':
+            self.file.write_table(pa.Table.from_batches([batch]))
+        else: self.file.write_batch(batch)
+
+    def close(self):
+
+        if self.file is not None: self.file.close()
+        self.size = os.path.getsize(self.path)
+        print '[ NtupleWriter ]: Wrote %s' % self.path
+
+class NtupleWriter(object):
+
+    def __init__(self, name, schema):
+
+        # The values of an event are set through attributes as with a rootpy
+        # Tree e.g. writer.q = 10 or writer.hadron_ke.push_back(ke).  Instead
+        # of filling the tree every event, the values are appended to typed
+        # buffers which are written out every cluster_size events.
+        settings = get_settings(name)
+
+        self.__dict__['name'] = name
+        self.__dict__['settings'] = settings
+        self.__dict__['columns'] = []
+        self.__dict__['specs'] = {}
+
+        # Values of the columns written in the current event.  Only these
+        # are appended to the buffers and reset once the event is filled,
+        # the other columns are set to their default when the events are
+        # written out.  Arrays and vectors are kept in slots that are reset
+        # in place.
+        self.__dict__['values'] = {}
+        self.__dict__['slots'] = {}
+        self.__dict__['buffer'] = ColumnAccumulator()
+        self.__dict__['n_buffered'] = 0
+        self.__dict__['cluster_size'] = settings['cluster_size']
+
+        # Columns are only buffered once they are populated.  Until then,
+        # filling an event doesn't cost anything for them.
+        self.__dict__['populated'] = []
+        self.__dict__['booked'] = []
+
+        # Number of events written and the time spent writing them
+        self.__dict__['n_entries'] = 0
+        self.__dict__['write_time'] = 0.
+
+        # The ntuple is written as a tree unless another format was
+        # configured
+        if OUTPUT['format'] == 'root':
+            self.__dict__['output'] = RootOutput(name, settings)
+        else: self.__dict__['output'] = ArrowOutput(name, OUTPUT['format'], settings)
+
+        for column in schema:
+            self.add_column(column.name, column.leaf_type, column.shape,
+                            column.default, column.jagged)
+
+        WRITERS.append(self)
+
+    def add_column(self, name, leaf_type, shape=(), default=0, jagged=False):
+
+        # Columns can only be added before any events are written
+        if self.booked or self.n_entries:
+            raise RuntimeError('Column %s added after %s was booked.' % (name, self.name))
+
+        self.columns.append(name)
+        self.specs[name] = (leaf_type, LEAF_TYPES[leaf_type], tuple(shape), default, jagged)
+
+    def create_branches(self, branches):
+
+        # Same as rootpy's Tree.create_branches i.e. a dict of column names
+        # and leaf types
+        for name, leaf_type in sorted(branches.iteritems()):
+            self.add_column(name, leaf_type)
+
+    def populate(self, name):
+
+        # Start buffering a column.  The events buffered so far get the
+        # default value of the column.
+        if name in self.buffer: return
+
+        leaf_type, dtype, shape, default, jagged = self.specs[name]
+        self.buffer.add_column(name, dtype, jagged=jagged, shape=shape)
+        self.populated.append(name)
+        self.pad(name, self.n_buffered)
+
+    def pad(self, name, n_events):
+
+        # Set the value of a column to its default up to the given number
+        # of buffered events
+        leaf_type, dtype, shape, default, jagged = self.specs[name]
+        column = self.buffer[name]
+        if jagged:
+            n = n_events + 1 - len(column.offsets)
+            column.offsets.extend(np.full(n, column.size, dtype=np.int64))
+        else:
+            column.extend(np.full((n_events - len(column),) + shape, default, dtype=dtype))
+
+    def get_values(self, name):
+
+        # The buffered values of a column along with the offsets delimiting
+        # each event for jagged columns.  Columns that weren't populated are
+        # set to their default.
+        leaf_type, dtype, shape, default, jagged = self.specs[name]
+        if name in self.buffer:
+            values = self.buffer[name].view()
+            if jagged: return values, self.buffer.get_offsets(name)
+            return values, None
+
+        if jagged:
+            return np.zeros(0, dtype=dtype), np.zeros(self.n_buffered + 1, dtype=np.int64)
+        return np.full((self.n_buffered,) + shape, default, dtype=dtype), None
+
+    def __getattr__(self, name):
+
+        if name not in self.specs: raise AttributeError(name)
+
+        leaf_type, dtype, shape, default, jagged = self.specs[name]
+        if name not in self.values:
+            if not (jagged or shape): return default
+
+            # Arrays and vectors are filled in place so they are considered
+            # written as soon as they are accessed
+            self.populate(name)
+            if name not in self.slots:
+                if jagged: self.slots[name] = VectorBuffer(dtype)
+                else: self.slots[name] = np.full(shape, default, dtype=dtype)
+            self.values[name] = self.slots[name]
+
+        return self.values[name]
+
+    def __setattr__(self, name, value):
+
+        if name in self.specs:
+            self.populate(name)
+            self.values[name] = value
+        elif name in self.__dict__: self.__dict__[name] = value
+        else:
+            raise AttributeError('%s is not a column of %s' % (name, self.name))
+
+    def fill(self, reset=False):
+
+        # Append the values of the columns written in the current event to
+        # their buffers.  Events in which a column wasn't written are set to
+        # the default first.
+        for name, value in self.values.iteritems():
+            leaf_type, dtype, shape, default, jagged = self.specs[name]
+            self.pad(name, self.n_buffered)
+            column = self.buffer[name]
+            if jagged:
+                if isinstance(value, VectorBuffer): value = value.view()
+                column.extend(np.asarray(value, dtype=dtype))
+                column.end_event()
+            else: column.append(value)
+        self.n_buffered += 1
+
+        if reset: self.reset()
+
+        if self.n_buffered >= self.cluster_size: self.flush()
+
+    def reset(self):
+
+        # Reset the columns written in the current event
+        for name in self.values:
+            if name not in self.slots: continue
+            leaf_type, dtype, shape, default, jagged = self.specs[name]
+            if jagged: self.slots[name].clear()
+            else: self.slots[name].fill(default)
+        self.values.clear()
+
+    def fill_batch(self, n_events, columns):
+
+        # Append the values of several events at once.  Flat columns are
+        # given as an array with a value (or array of values) per event and
+        # jagged columns as a tuple of flat values and the offsets delimiting
+        # each event.  Columns that aren't given are set to their default.
+        for name, values in columns.iteritems():
+            self.populate(name)
+            self.pad(name, self.n_buffered)
+            leaf_type, dtype, shape, default, jagged = self.specs[name]
+            column = self.buffer[name]
+            if jagged:
+                values, offsets = values
+                column.extend(np.asarray(values, dtype=dtype)[offsets[0]:offsets[-1]])
+                column.offsets.extend(offsets[1:] - offsets[0] + column.offsets.view()[-1])
+            else: column.extend(np.asarray(values, dtype=dtype))
+        self.n_buffered += n_events
+
+        for name in self.populated: self.pad(name, self.n_buffered)
+
+        if self.n_buffered >= self.cluster_size: self.flush()
+
+    def flush(self):
+
+        # Write the buffered events out
+        start = time.time()
+
+        # Parquet and Arrow files need all columns from the start while trees
+        # get branches for newly populated columns
+        if self.output.fixed_schema: names = self.columns
+        else: names = [name for name in self.columns if name in self.buffer]
+
+        new = [name for name in names if name not in self.booked]
+        if new:
+            self.output.book(self, new)
+            self.booked.extend(new)
+        if not self.n_buffered: return
+
+        for name in self.populated: self.pad(name, self.n_buffered)
+        self.output.write(self, names)
+        self.n_entries += self.n_buffered
+
+        self.buffer.clear()
+        self.n_buffered = 0
+        self.write_time += time.time() - start
+
+    def write(self):
+
+        self.flush()
+
+        start = time.time()
+        self.output.close()
+        self.write_time += time.time() - start
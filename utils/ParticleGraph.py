@@ -0,0 +1,76 @@
+
+import numpy as np
+
+class ParticleGraph(object):
+
+    def __init__(self, batch):
+
+        # The SimParticles of all events of a batch stored as a struct of
+        # arrays.  Particle indices point into these flattened arrays and the
+        # particles of event i are given by offsets[i]:offsets[i + 1].
+        self.pdg_id, self.offsets = batch.get_jagged('SimParticles_sim', 'pdgID_')
+        self.status = batch.get_jagged('SimParticles_sim', 'genStatus_')[0]
+        self.process = batch.get_jagged('SimParticles_sim', 'processType_')[0]
+        self.energy = batch.get_jagged('SimParticles_sim', 'energy_')[0]
+        self.mass = batch.get_jagged('SimParticles_sim', 'mass_')[0]
+        self.px = batch.get_jagged('SimParticles_sim', 'px_')[0]
+        self.py = batch.get_jagged('SimParticles_sim', 'py_')[0]
+        self.pz = batch.get_jagged('SimParticles_sim', 'pz_')[0]
+        self.vx = batch.get_jagged('SimParticles_sim', 'x_')[0]
+        self.vy = batch.get_jagged('SimParticles_sim', 'y_')[0]
+        self.vz = batch.get_jagged('SimParticles_sim', 'z_')[0]
+        self.end_z = batch.get_jagged('SimParticles_sim', 'endZ_')[0]
+        self.n_particles = len(self.pdg_id)
+
+        # The daughters and parents of every particle in CSR form i.e. the
+        # daughters of particle i are given by
+        # daughters[daughter_offsets[i]:daughter_offsets[i + 1]].  Only the 
+        # references to persisted particles are kept.
+        self.daughters, self.daughter_offsets, self.daughter_count, \
+                self.first_daughter = self.build_index(batch, 'daughters_')
+        self.parents, self.parent_offsets, self.parent_count, \
+                self.first_parent = self.build_index(batch, 'parents_')
+
+    def build_index(self, batch, member):
+
+        # Resolve the references of all particles.  References to particles
+        # that weren't persisted are dropped from the index.  The number of
+        # references and the first reference of every particle are returned 
+        # as stored i.e. as getDaughterCount() and getDaughter(0) would see 
+        # them, with -1 if there is no first reference or it can't be 
+        # resolved.
+        index, offsets = batch.get_ref_array_index('SimParticles_sim', member,
+                                                   'SimParticles_sim')
+        count = np.diff(offsets)
+        owner = np.repeat(np.arange(self.n_particles), count)
+        resolved = index >= 0
+
+        first = np.full(self.n_particles, -1, dtype=np.int64)
+        first[count > 0] = index[offsets[:-1][count > 0]]
+
+        resolved_count = np.bincount(owner[resolved], minlength=self.n_particles)
+        index_offsets = np.zeros(self.n_particles + 1, dtype=np.int64)
+        np.cumsum(resolved_count, out=index_offsets[1:])
+
+        return index[resolved], index_offsets, count, first
+
+    def get_event(self, ievent):
+        return slice(self.offsets[ievent], self.offsets[ievent + 1])
+
+    def get_daughters(self, particle):
+        return self.daughters[self.daughter_offsets[particle]:self.daughter_offsets[particle + 1]]
+
+    def get_parents(self, particle):
+        return self.parents[self.parent_offsets[particle]:self.parent_offsets[particle + 1]]
+
+    def get_kinetic_energy(self):
+        return self.energy - self.mass
+
+    def is_daughter_of(self, mask):
+
+        # Flag the particles that are daughters of any of the particles
+        # selected by the mask
+        owner = np.repeat(np.arange(self.n_particles), np.diff(self.daughter_offsets))
+        is_daughter = np.zeros(self.n_particles, dtype=bool)
+        is_daughter[self.daughters[mask[owner]]] = True
+        return is_daughter
@@ -1,214 +1,588 @@
 
+import cPickle
+import multiprocessing
+import os
+import shutil
+import tempfile
 import numpy as np
 import ROOT as r
-import matplotlib
-import matplotlib.pyplot as plt
-import root_numpy as rnp
 
 from itertools import izip
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.colors import LogNorm
 from rootpy.plotting import Hist
 
-class Plotter(object):
+# PyPDF2 is used to assemble pages rendered in parallel.  Without it, pages
+# are rendered one after the other.
+try:
+    from PyPDF2 import PdfFileMerger
+except ImportError:
+    PdfFileMerger = None
+
+# matplotlib is only imported when the plots are rendered so jobs that only
+# need the ROOT histograms (headless) don't pay for it.
+
+# Settings shared by all plotters.  These are set by ldmxpy from the 
+# configuration or command line.  In headless mode, the plots aren't rendered
+# and are instead saved as binned data to <file_path>.plots so they can be
+# rendered later on using render_plots.py.
+SETTINGS = {
+    'headless' : False
+}
+
+def configure(headless=False):
+    SETTINGS['headless'] = headless
+
+def bin_index(values, bins, x_min, x_max):
+
+    # Index of the bin each value falls in with uniform binning.  Bins are
+    # numbered as in ROOT i.e. bin 0 holds the underflow and bin bins + 1 
+    # the overflow.  The index is clipped before the cast to an integer so
+    # infinite values end up in the under or overflow and, as with
+    # TAxis::FindBin, NaN values in the overflow.
+    index = np.floor(bins*(np.asarray(values, dtype=np.float64) - x_min)
+                     /float(x_max - x_min))
+    index = np.where(np.isnan(index), bins, index)
+    return np.clip(index, -1, bins).astype(np.int64) + 1
+
+def histogram(values, bins, x_min, x_max, categories=None, n_categories=1, 
+              weights=None):
+
+    # Fill a histogram with uniform binning for each of the categories in a 
+    # single pass over the values.  The bin contents are laid out as in ROOT 
+    # i.e. bin 0 holds the underflow and bin bins + 1 the overflow.  
+    index = bin_index(values, bins, x_min, x_max)
+    if categories is not None: index += categories*(bins + 2)
+
+    return np.bincount(index, weights=weights, 
+                       minlength=n_categories*(bins + 2)).reshape(-1, bins + 2)
+
+def edge_counts(values, x_max, categories=None, n_categories=1, weights=None):
+
+    # Number (or sum of the weights) of the values exactly at the upper edge
+    # for each of the categories.  ROOT puts them in the overflow while numpy
+    # and matplotlib include them in the last bin (see displayed_counts).
+    at_edge = np.asarray(values, dtype=np.float64) == x_max
+    if categories is None: categories = np.zeros(len(at_edge), dtype=np.int64)
+    if weights is not None: weights = np.asarray(weights, dtype=np.float64)[at_edge]
+    return np.bincount(categories[at_edge], weights=weights, 
+                       minlength=n_categories).astype(np.float64)
+
+def displayed_counts(counts, edge=0):
+
+    # Contents of the bins drawn on a PDF page from counts laid out as in 
+    # ROOT.  The values exactly at the upper edge are moved from the overflow
+    # to the last bin as done when histogramming with numpy or matplotlib.
+    counts = np.array(counts[1:-1], dtype=np.float64)
+    counts[-1] += edge
+    return counts
+
+def histogram2d(x_values, y_values, bins_x, x_min, x_max, bins_y, y_min, y_max,
+                weights=None):
+
+    # Same as histogram() in two dimensions.  The bin contents are laid out
+    # as in ROOT i.e. the contents of bin (x, y) are at x + (bins_x + 2)*y.
+    index = (bin_index(x_values, bins_x, x_min, x_max) 
+             + (bins_x + 2)*bin_index(y_values, bins_y, y_min, y_max))
+    return np.bincount(index, weights=weights, 
+                       minlength=(bins_x + 2)*(bins_y + 2))
+
+def array_view(buf, dtype, size):
+
+    # View the C array backing a ROOT object as a numpy array
+    buf.SetSize(size)
+    return np.frombuffer(buf, dtype=dtype, count=size)
+
+def set_bin_contents(histo, counts, sumw2=None, entries=None):
+
+    # Set the contents of all bins of a ROOT histogram, including the under
+    # and overflow bins, with a single copy instead of setting them one bin
+    # at a time.  The errors are set from the sum of the squared weights if 
+    # one is given.
+    size = histo.GetNcells()
+    dtype = np.float64 if isinstance(histo, r.TArrayD) else np.float32
+    array_view(histo.GetArray(), dtype, size)[:] = counts
+
+    if sumw2 is not None: 
+        histo.Sumw2()
+        array_view(histo.GetSumw2().GetArray(), np.float64, size)[:] = sumw2
+
+    # The statistics are computed from the new bin contents
+    histo.ResetStats()
+    if entries is None: entries = np.sum(counts)
+    histo.SetEntries(entries)
+
+def bin_edges(values, bins):
+
+    # Bin edges used to histogram a list of arrays.  If only the number of 
+    # bins is given, they span the range of all of the values as done by
+    # matplotlib.
+    if not np.isscalar(bins): return np.asarray(bins, dtype=np.float64)
+
+    values = [np.asarray(x) for x in values if len(x)]
+    x_range = (0, 1)
+    if values: x_range = (min(x.min() for x in values), max(x.max() for x in values))
+    return np.histogram(np.array(x_range), bins)[1]
+
+class Histogram(object):
+
+    def __init__(self, name, bins, x_min, x_max, x_label='', root_label=None):
+
+        # Histogram with uniform binning that is filled incrementally so only
+        # the bin contents are kept in memory.  The contents and the sum of
+        # the squared weights are laid out as in ROOT i.e. they include the
+        # under and overflow bins.
+        self.name = name
+        self.bins = bins
+        self.x_min = x_min
+        self.x_max = x_max
+        self.x_label = x_label
+        self.root_label = root_label or x_label
+
+        self.counts = np.zeros(bins + 2)
+        self.sumw2 = np.zeros(bins + 2)
+        self.entries = 0
+
+        # Values exactly at x_max, which are drawn in the last bin
+        self.edge = 0.
+
+    def fill(self, values, weights=None):
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        counts = histogram(values, self.bins, self.x_min, self.x_max, 
+                           weights=weights)[0]
+        self.counts += counts
+        if weights is None: self.sumw2 += counts
+        else: 
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+            self.sumw2 += histogram(values, self.bins, self.x_min, self.x_max, 
+                                    weights=weights*weights)[0]
+        self.edge += edge_counts(values, self.x_max, weights=weights)[0]
+        self.entries += len(values)
 
-    def __init__(self, file_path): 
-        
-        plt.style.use('bmh')
-        matplotlib.rcParams.update({'font.size': 20})
-        matplotlib.rcParams['axes.facecolor'] = 'white'
-        matplotlib.rcParams['legend.numpoints'] = 1
-        matplotlib.rcParams['legend.fontsize'] = 12
-        
-        self.pdf = PdfPages(file_path + '.pdf')
-        print '[ Plotter ] Saving plots to %s' % (file_path + '.pdf')
+    def merge(self, other):
 
-        self.rfile = r.TFile(file_path + '.root', 'recreate')
-        print '[ Plotter ] Writing histograms to %s' % (file_path + '.root')
+        # Add the contents of a histogram with the same binning e.g. one 
+        # filled by another process
+        if (self.bins, self.x_min, self.x_max) != (other.bins, other.x_min, other.x_max):
+            raise RuntimeError('Histogram %s can\'t be merged with a histogram with a different binning.' % self.name)
 
-    def plot_hist(self, values, bins, **params):
-       
-        name = None
-        if 'name' in params: 
-            name = params['name']
- 
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
-        
-        label=None
-        if 'label' in params:
-            label=params['label']
-            ax.legend()
-       
-        norm = False
-        if 'norm' in params: 
-            norm = True
+        self.counts += other.counts
+        self.sumw2 += other.sumw2
+        self.edge += other.edge
+        self.entries += other.entries
 
-        if 'ylog' in params:
-            if norm: ax.set_yscale('log')
-            else: ax.set_yscale('symlog')
+    def edges(self):
+        return np.linspace(self.x_min, self.x_max, self.bins + 1)
 
-        if 'x_label' in params:
-            ax.set_xlabel(params['x_label'])
+class Histograms(object):
 
+    def __init__(self):
 
-        ax.hist(values, bins, histtype='step', lw=1.5, label=label, normed=norm)
+        # Histograms booked by name, in the order they were booked
+        self.names = []
+        self.histograms = {}
 
-        self.pdf.savefig(bbox_inches='tight')
-        plt.close()
+    def book(self, name, bins, x_min, x_max, x_label='', root_label=None):
 
-    def plot_hist2d(self, x_values, y_values, bins_x, bins_y, **params):
+        if name in self.histograms: 
+            raise RuntimeError('Histogram %s has already been booked.' % name)
 
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
-        
-        if 'x_label' in params:
-            ax.set_xlabel(params['x_label'])
+        self.names.append(name)
+        self.histograms[name] = Histogram(name, bins, x_min, x_max, x_label, 
+                                          root_label)
+        return self.histograms[name]
 
-        if 'y_label' in params:
-            ax.set_ylabel(params['y_label'])
-        im = ax.hist2d(x_values, y_values, bins=[bins_x, bins_y], norm=LogNorm())
+    def fill(self, name, values, weights=None):
+        self.histograms[name].fill(values, weights)
 
-        fig.colorbar(im[3], ax=ax) 
-        
-        self.pdf.savefig(bbox_inches='tight')
-        plt.close()
+    def merge(self, other):
+        for name in self.names: 
+            self.histograms[name].merge(other.histograms[name])
 
-    def plot_hists(self, values, bins, **params):
-    
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
+    def render(self, plotter, **params):
 
-        label=None
+        # Plot each of the histograms on its own page and write it to the 
+        # ROOT file.  The parameters are passed to both.
+        for name in self.names: 
+            plotter.plot_histograms([self.histograms[name]], **params)
+            plotter.write_histogram(self.histograms[name], **params)
 
-        norm = False
-        if 'norm' in params: 
-            norm = True
+    def __getitem__(self, name):
+        return self.histograms[name]
 
-        if 'ylog' in params:
-            if norm: ax.set_yscale('log')
-            else: ax.set_yscale('symlog')
-        
-        if 'xlog' in params:
-            if norm: ax.set_xscale('log')
-            else: ax.set_xscale('symlog')
-
-        if 'x_label' in params:
-            ax.set_xlabel(params['x_label'])
-
-        labels = None
-        if 'labels' in params:
-            labels = params['labels']
-
-        label_loc=0
-        box = None
-        if 'label_loc' in params: 
-            if params['label_loc'] == 10: 
-                box = ax.get_position()
-                ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
-            else:
-                label_loc=params['label_loc']
-
-        for x_arr, label in izip(values, labels):
-            ax.hist(x_arr, bins, histtype='step', lw=1.5, normed=norm, label=label)
-
-        if box:
-            ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-        else: 
-            ax.legend(loc=label_loc)
+    def __iter__(self):
+        return (self.histograms[name] for name in self.names)
 
-        self.pdf.savefig(bbox_inches='tight')
-        plt.close()
+    def __contains__(self, name):
+        return name in self.histograms
 
-    def plot_graph(self, x, y, x_err, y_err, **params):
-       
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
-        
-        label=None
-        if 'label' in params:
-            label=params['label']
-            ax.legend()
-       
-        if 'x_label' in params:
-            ax.set_xlabel(params['x_label'])
+def set_style():
 
-        if 'y_label' in params:
-            ax.set_ylabel(params['y_label'])
+    import matplotlib
+    import matplotlib.pyplot as plt
 
-        if 'ylim' in params: 
-            ax.set_ylim(params['ylim'])
+    plt.style.use('bmh')
+    matplotlib.rcParams.update({'font.size': 20})
+    matplotlib.rcParams['axes.facecolor'] = 'white'
+    matplotlib.rcParams['legend.numpoints'] = 1
+    matplotlib.rcParams['legend.fontsize'] = 12
 
-        if 'xlog' in params:
-            ax.set_xscale('symlog')
+# Each page of the PDF is recorded as the type of plot, the binned data and
+# the styling parameters and drawn by one of the functions below once the
+# plotter is closed.
 
-        if 'ylog' in params:
-            ax.set_yscale('log')
+def draw_hist(fig, ax, counts, bins, **params):
 
-        ax.errorbar(x, y, x_err, y_err, markersize=10, marker='o', 
-                    linestyle='-', fmt='', label=label)
+    label=None
+    if 'label' in params:
+        label=params['label']
+        ax.legend()
+   
+    norm = False
+    if 'norm' in params: 
+        norm = True
 
-        self.pdf.savefig(bbox_inches='tight')
-        plt.close()
+    if 'ylog' in params:
+        if norm: ax.set_yscale('log')
+        else: ax.set_yscale('symlog')
 
+    if 'x_label' in params:
+        ax.set_xlabel(params['x_label'])
 
-    def plot_graphs(self, x, y, x_err, y_err, **params):
-       
-        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
-        
-        labels=None
-        if 'labels' in params:
-            labels=params['labels']
+    centers = (bins[:-1] + bins[1:])/2.
+    ax.hist(centers, bins, histtype='step', lw=1.5, label=label, normed=norm, 
+            weights=counts)
+
+def draw_hist2d(fig, ax, counts, bins_x, bins_y, **params):
+
+    from matplotlib.colors import LogNorm
+
+    if 'x_label' in params:
+        ax.set_xlabel(params['x_label'])
+
+    if 'y_label' in params:
+        ax.set_ylabel(params['y_label'])
+
+    # The contents of each bin are used as the weight of its center
+    x, y = np.meshgrid((bins_x[:-1] + bins_x[1:])/2., (bins_y[:-1] + bins_y[1:])/2., 
+                       indexing='ij')
+    im = ax.hist2d(x.ravel(), y.ravel(), bins=[bins_x, bins_y], 
+                   weights=counts.ravel(), norm=LogNorm())
+
+    fig.colorbar(im[3], ax=ax) 
+
+def draw_hists(fig, ax, counts, bins, **params):
+
+    norm = False
+    if 'norm' in params: 
+        norm = True
 
-        label_loc=0
-        if 'label_loc' in params: 
+    if 'ylog' in params:
+        if norm: ax.set_yscale('log')
+        else: ax.set_yscale('symlog')
+    
+    if 'xlog' in params:
+        if norm: ax.set_xscale('log')
+        else: ax.set_xscale('symlog')
+
+    if 'x_label' in params:
+        ax.set_xlabel(params['x_label'])
+
+    labels = None
+    if 'labels' in params:
+        labels = params['labels']
+
+    label_loc=0
+    box = None
+    if 'label_loc' in params: 
+        if params['label_loc'] == 10: 
+            box = ax.get_position()
+            ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
+        else:
             label_loc=params['label_loc']
-       
-        if 'x_label' in params:
-            ax.set_xlabel(params['x_label'])
 
-        if 'y_label' in params:
-            ax.set_ylabel(params['y_label'])
+    centers = (bins[:-1] + bins[1:])/2.
+    for hist_counts, label in izip(counts, labels):
+        ax.hist(centers, bins, histtype='step', lw=1.5, normed=norm, 
+                label=label, weights=hist_counts)
+
+    if box:
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    else: 
+        ax.legend(loc=label_loc)
+
+def draw_graph(fig, ax, x, y, x_err, y_err, **params):
+   
+    label=None
+    if 'label' in params:
+        label=params['label']
+        ax.legend()
+   
+    if 'x_label' in params:
+        ax.set_xlabel(params['x_label'])
+
+    if 'y_label' in params:
+        ax.set_ylabel(params['y_label'])
+
+    if 'ylim' in params: 
+        ax.set_ylim(params['ylim'])
+
+    if 'xlog' in params:
+        ax.set_xscale('symlog')
+
+    if 'ylog' in params:
+        ax.set_yscale('log')
+
+    ax.errorbar(x, y, x_err, y_err, markersize=10, marker='o', 
+                linestyle='-', fmt='', label=label)
+
+def draw_graphs(fig, ax, x, y, x_err, y_err, **params):
+   
+    labels=None
+    if 'labels' in params:
+        labels=params['labels']
+
+    label_loc=0
+    if 'label_loc' in params: 
+        label_loc=params['label_loc']
+   
+    if 'x_label' in params:
+        ax.set_xlabel(params['x_label'])
+
+    if 'y_label' in params:
+        ax.set_ylabel(params['y_label'])
+
+    if 'ylim' in params: 
+        ax.set_ylim(params['ylim'])
+    
+    if 'xlog' in params:
+        ax.set_xscale('symlog')
+
+    for index in xrange(0, len(x)):
+        ax.errorbar(x[index], y[index], 0, 0, 
+                    markersize=6, marker='o', 
+                    linestyle='-', fmt='', label=labels[index])
+
+    if labels: ax.legend(loc=label_loc)
+
+DRAW = {
+    'hist' : draw_hist,
+    'hist2d' : draw_hist2d,
+    'hists' : draw_hists,
+    'graph' : draw_graph,
+    'graphs' : draw_graphs
+}
+
+def render_page(page):
+
+    import matplotlib.pyplot as plt
+
+    kind, args, params = page
+    fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(15, 10))
+    DRAW[kind](fig, ax, *args, **params)
+    return fig
+
+def render_page_to_file(task):
+
+    # Render a page to its own PDF so pages can be rendered in separate
+    # processes
+    import matplotlib.pyplot as plt
+
+    path, page = task
+    fig = render_page(page)
+    fig.savefig(path, format='pdf', bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+def render_pages(pages, pdf_path, processes=None):
+
+    # Render the pages to a PDF.  The pages are rendered by a pool of 
+    # processes (one per core by default) and assembled in order.
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    set_style()
+    processes = processes or multiprocessing.cpu_count()
+
+    if (PdfFileMerger is None or processes < 2 or len(pages) < 2): 
+        pdf = PdfPages(pdf_path)
+        for page in pages:
+            fig = render_page(page)
+            pdf.savefig(fig, bbox_inches='tight')
+            plt.close(fig)
+        pdf.close()
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        tasks = [(os.path.join(directory, 'page_%s.pdf' % index), page)
+                 for index, page in enumerate(pages)]
+        pool = multiprocessing.Pool(min(processes, len(tasks)), set_style)
+        paths = pool.map(render_page_to_file, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+
+        merger = PdfFileMerger()
+        for path in paths: merger.append(path)
+        merger.write(pdf_path)
+        merger.close()
+    finally:
+        shutil.rmtree(directory)
+
+def save_pages(pages, path):
+    with open(path, 'wb') as f: cPickle.dump(pages, f, cPickle.HIGHEST_PROTOCOL)
+
+def render_plots(path, pdf_path=None, processes=None):
+
+    # Render the plots saved by a headless job.  By default, the PDF is 
+    # written next to the saved plots.
+    if pdf_path is None: pdf_path = os.path.splitext(path)[0] + '.pdf'
+
+    with open(path, 'rb') as f: pages = cPickle.load(f)
+    print '[ Plotter ] Saving plots to %s' % pdf_path
+    render_pages(pages, pdf_path, processes)
 
-        if 'ylim' in params: 
-            ax.set_ylim(params['ylim'])
+class Plotter(object):
+
+    def __init__(self, file_path, processes=None, headless=None): 
         
-        if 'xlog' in params:
-            ax.set_xscale('symlog')
+        # ROOT histograms are kept in memory and written to the file in a 
+        # single write when the plotter is closed
+        self.root_hists = []
+
+        # Plots are recorded as they are requested and only rendered (or 
+        # saved in headless mode) once the plotter is closed.
+        self.pages = []
+        self.processes = processes
+
+        self.headless = headless
+        if headless is None: self.headless = SETTINGS['headless']
+
+        self.pdf_path = file_path + '.pdf'
+        self.plots_path = file_path + '.plots'
+        if self.headless: print '[ Plotter ] Saving plot data to %s' % self.plots_path
+        else: print '[ Plotter ] Saving plots to %s' % self.pdf_path
+
+        self.rfile = r.TFile(file_path + '.root', 'recreate')
+        print '[ Plotter ] Writing histograms to %s' % (file_path + '.root')
+
+    def add_page(self, kind, args, params):
+        self.pages.append((kind, args, params))
 
-        for index in xrange(0, len(x)):
-            ax.errorbar(x[index], y[index], 0, 0, 
-                        markersize=6, marker='o', 
-                        linestyle='-', fmt='', label=labels[index])
+    def plot_hist(self, values, bins, **params):
+        counts, bins = np.histogram(values, bin_edges([values], bins))
+        self.add_page('hist', (counts, bins), params)
+
+    def plot_hist2d(self, x_values, y_values, bins_x, bins_y, **params):
+        counts, bins_x, bins_y = np.histogram2d(x_values, y_values, 
+                                                bins=[bins_x, bins_y])
+        self.add_page('hist2d', (counts, bins_x, bins_y), params)
 
-        if labels: ax.legend(loc=label_loc)
+    def plot_hists(self, values, bins, **params):
+    
+        bins = bin_edges(values, bins)
+        weights = params.pop('weights', [None]*len(values))
+        counts = [np.histogram(x_arr, bins, weights=w_arr)[0]
+                  for x_arr, w_arr in izip(values, weights)]
+        self.add_page('hists', (counts, bins), params)
+
+    def plot_binned_hists(self, counts, bins, **params):
         
-        self.pdf.savefig(bbox_inches='tight')
-        plt.close()
+        # Plot histograms that have already been filled e.g. using 
+        # histogram().
+        self.add_page('hists', (list(counts), np.asarray(bins, dtype=np.float64)), 
+                      params)
 
-    def create_root_hist(self, name, values, bins, x_min, x_max, x_label, **params):
+    def plot_histograms(self, histograms, **params):
+
+        # Plot booked histograms on the same page.  The histograms need to
+        # have the same binning.
+        if 'x_label' not in params: params['x_label'] = histograms[0].x_label
+        self.plot_binned_hists([displayed_counts(histogram.counts, histogram.edge) 
+                                for histogram in histograms],
+                               histograms[0].edges(), **params)
+
+    def plot_graph(self, x, y, x_err, y_err, **params):
+        self.add_page('graph', (x, y, x_err, y_err), params)
+
+    def plot_graphs(self, x, y, x_err, y_err, **params):
+        self.add_page('graphs', (x, y, x_err, y_err), params)
+
+    def book_root_hist(self, name, bins, x_min, x_max, x_label, **params):
         
         color = 1
         if 'color' in params: 
             color=params['color']
 
-        weights = None
-        if 'weights' in params: 
-            weights = params['weights']
-
+        self.rfile.cd()
         histo = Hist(bins, x_min, x_max, name=name, title=name, type='F')
         histo.GetXaxis().SetTitle(x_label)
         histo.GetXaxis().CenterTitle()
         histo.SetLineColor(color)
         histo.SetMarkerColor(color)
         histo.SetMarkerSize(0.5)
-        rnp.fill_hist(histo, values, weights)
-        histo.Write()
+        self.root_hists.append(histo)
+        return histo
+
+    def create_root_hist(self, name, values, bins, x_min, x_max, x_label, **params):
+
+        weights = None
+        if 'weights' in params: 
+            weights = params['weights']
+
+        # The sum of the squared weights is only needed for weighted fills
+        counts = histogram(values, bins, x_min, x_max, weights=weights)[0]
+        sumw2 = None
+        if weights is not None: 
+            weights = np.asarray(weights, dtype=np.float64)
+            sumw2 = histogram(values, bins, x_min, x_max, weights=weights*weights)[0]
+
+        histo = self.book_root_hist(name, bins, x_min, x_max, x_label, **params)
+        set_bin_contents(histo, counts, sumw2, len(values))
+
+    def create_root_hist_from_counts(self, name, counts, x_min, x_max, x_label, **params):
+        
+        # Write a histogram that has already been filled e.g. using 
+        # histogram().  The counts include the under and overflow bins.  If 
+        # the histogram was weighted, the sum of the squared weights can be
+        # given as sumw2.
+        histo = self.book_root_hist(name, len(counts) - 2, x_min, x_max, 
+                                    x_label, **params)
+        set_bin_contents(histo, counts, params.get('sumw2'), params.get('entries'))
+
+    def write_histogram(self, histogram, **params):
+
+        # Write a booked histogram to the ROOT file
+        params = dict(params, sumw2=histogram.sumw2, entries=histogram.entries)
+        self.create_root_hist_from_counts(histogram.name, histogram.counts, 
+                                          histogram.x_min, histogram.x_max, 
+                                          histogram.root_label, **params)
 
     def create_root_hist2d(self, name, x_vals, y_vals, bins_x, x_min, x_max, bins_y, y_min, y_max, **params): 
 
+        weights = None
+        if 'weights' in params: 
+            weights = params['weights']
+
+        counts = histogram2d(x_vals, y_vals, bins_x, x_min, x_max, bins_y, y_min, 
+                             y_max, weights)
+        sumw2 = None
+        if weights is not None: 
+            weights = np.asarray(weights, dtype=np.float64)
+            sumw2 = histogram2d(x_vals, y_vals, bins_x, x_min, x_max, bins_y, 
+                                y_min, y_max, weights*weights)
+
+        self.rfile.cd()
         histo = r.TH2F(name, name, bins_x, x_min, x_max, bins_y, y_min, y_max)
-        rnp.fill_hist(histo, np.column_stack((x_vals, y_vals)))
-        histo.Write()
+        set_bin_contents(histo, counts, sumw2, len(x_vals))
+        self.root_hists.append(histo)
 
     def close(self):
-        self.pdf.close()
+
+        if self.headless: save_pages(self.pages, self.plots_path)
+        else: render_pages(self.pages, self.pdf_path, self.processes)
+
+        # Write all of the histograms at once
+        self.rfile.Write()
         self.rfile.Close()
 
 
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+import argparse
+import Plotter
+
+def main():
+
+    # Parse all command line arguments using the argparse module
+    parser = argparse.ArgumentParser(
+            description='Render the plots saved by a headless ldmxpy job to PDF.')
+    parser.add_argument('files', nargs='+', 
+                        help='Plot files (.plots) to render.')
+    parser.add_argument('-j', action='store', dest='processes', type=int, 
+                        help='Number of processes used to render the pages.')
+    args = parser.parse_args()
+
+    for path in args.files: 
+        Plotter.render_plots(path, processes=args.processes)
+
+if __name__ == "__main__":
+    main()